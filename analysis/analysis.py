@@ -1,4 +1,5 @@
 import asyncio
+import json
 import os
 import sys
 from test_load_distribution import test_load_distribution
@@ -92,7 +93,32 @@ def create_analysis_report(load_results, scalability_results):
     
     return report
 
-async def run_full_analysis():
+def create_load_test_report(load_test):
+    """Markdown section for a load_generator.py JSON report"""
+    latency = load_test['latency_ms']
+    report = "\n## A-3: Open-Loop Latency Test\n\n"
+    report += (f"{load_test['requests']} requests to `{load_test['url']}` at a fixed schedule "
+               f"({load_test['throughput_rps']:.1f} req/s achieved, at most {load_test['concurrency']} in flight). "
+               "Latency is measured from each request's scheduled send time, so queueing behind slow "
+               "responses is included.\n\n")
+    report += "| Rate (req/s) | Duration (s) | p50 (ms) | p90 (ms) | p99 (ms) | p99.9 (ms) | Error Rate |\n"
+    report += "|--------------|--------------|----------|----------|----------|------------|------------|\n"
+    for step in load_test['steps']:
+        stats = step['latency_ms']
+        report += (f"| {step['rate']:.0f} | {step['duration']:g} | {stats['p50']:.2f} | {stats['p90']:.2f} | "
+                   f"{stats['p99']:.2f} | {stats['p99.9']:.2f} | {step['error_rate'] * 100:.2f}% |\n")
+    report += (f"| **All** | {load_test['elapsed_s']:.1f} | {latency['p50']:.2f} | {latency['p90']:.2f} | "
+               f"{latency['p99']:.2f} | {latency['p99.9']:.2f} | {load_test['error_rate'] * 100:.2f}% |\n")
+
+    if load_test['errors']:
+        report += "\n**Errors**: " + ", ".join(f"{reason}: {count}" for reason, count in load_test['errors'].items()) + "\n"
+    report += "\n**Per-Backend Distribution**:\n"
+    for name, backend in load_test['backends'].items():
+        report += (f"- **{name}**: {backend['requests']} requests ({backend['share'] * 100:.1f}%), "
+                   f"p99 {backend['latency_ms']['p99']:.2f} ms\n")
+    return report
+
+async def run_full_analysis(load_test_path='results/load_test.json'):
     """Run complete analysis suite"""
     print("=" * 60)
     print("LOAD BALANCER PERFORMANCE ANALYSIS")
@@ -113,6 +139,10 @@ async def run_full_analysis():
         # Generate report
         print("\n📊 Generating Analysis Report...")
         report = create_analysis_report(load_results, scalability_results)
+        if os.path.exists(load_test_path):
+            # Written by: python load_generator.py --json results/load_test.json
+            with open(load_test_path) as f:
+                report += create_load_test_report(json.load(f))
         
         with open('results/analysis_report.md', 'w') as f:
             f.write(report)
@@ -130,5 +160,12 @@ async def run_full_analysis():
         return False
 
 if __name__ == "__main__":
-    success = asyncio.run(run_full_analysis())
+    if "--local" in sys.argv:
+        # No docker: run the load balancer and its servers as local processes on the same port
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'load_balancer'))
+        from local_fleet import LocalFleet
+        with LocalFleet(port=5050):
+            success = asyncio.run(run_full_analysis())
+    else:
+        success = asyncio.run(run_full_analysis())
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""Offline ring churn simulator.
+
+Replays a key stream through a lookup engine while a scripted sequence of
+membership events runs, and reports after each event how many requests were
+remapped and how evenly the load is spread. No containers are involved, and
+keys are hashed once and looked up in bulk, so 10M requests over dozens of
+events take seconds.
+
+    python churn_simulator.py --keys zipf --num-keys 10000000 --events add:3,remove:0,add,weight:1=2
+    python churn_simulator.py --keys ../requests.jsonl --key-field request_id --engine maglev --plot
+
+Events (comma separated): add[:COUNT], remove[:NODE] (a random node if none
+given), weight:NODE=WEIGHT.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'load_balancer'))
+from consistent_hash import blake2b_hash, splitmix64_array
+from lookup_engines import ENGINES
+
+DEFAULT_EVENTS = "add,add,add,remove:1,remove:4,add:2,weight:0=2,remove"
+
+
+def generate_keys(distribution, num_keys, key_space, zipf_s, seed):
+    """(unique key hashes, request count per key) for a generated uniform or Zipfian stream"""
+    rng = np.random.default_rng(seed)
+    if distribution == "uniform":
+        keys = rng.integers(0, key_space, num_keys)
+    else:
+        keys = rng.zipf(zipf_s, num_keys) % key_space
+    keys, counts = np.unique(keys, return_counts=True)
+    key_hashes = splitmix64_array(keys)
+    order = np.argsort(key_hashes)  # Sorted hashes make the ring's searchsorted far more cache friendly
+    return key_hashes[order], counts[order]
+
+
+def load_keys(path, key_field):
+    """(unique key hashes, request count per key) for a JSON-lines file, hashed like the load balancer does"""
+    hashes = []
+    with open(path) as f:
+        for line in filter(None, (line.strip() for line in f)):
+            try:
+                record = json.loads(line)
+                key = record.get(key_field, line) if isinstance(record, dict) else line
+            except json.JSONDecodeError:
+                key = line
+            hashes.append(blake2b_hash(key))
+    return np.unique(np.array(hashes, dtype=np.uint64), return_counts=True)
+
+
+def parse_events(spec):
+    """Parse "add:3,remove:0,weight:1=2" into (action, argument) pairs"""
+    events = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        action, _, argument = entry.partition(':')
+        if action == "add":
+            events.extend([("add", None)] * int(argument or 1))
+        elif action == "remove":
+            events.append(("remove", int(argument) if argument else None))
+        elif action == "weight":
+            node, _, weight = argument.partition('=')
+            events.append(("weight", (int(node), float(weight))))
+        else:
+            raise ValueError(f"Unknown event: {entry}")
+    return events
+
+
+def node_loads(owners, counts, members):
+    """Requests owned by each member node, in the order of members; nodes that own no keys count as 0"""
+    members = np.asarray(members, dtype=np.int64)
+    return np.bincount(owners, weights=counts, minlength=members.max() + 1)[members]
+
+
+def load_stats(owners, counts, members):
+    """Per-node request counts and spread statistics for one membership state"""
+    loads = node_loads(owners, counts, members)
+    mean = loads.mean()
+    return {
+        "nodes": len(loads),
+        "mean_load": float(mean),
+        "min_load": float(loads.min()),
+        "max_load": float(loads.max()),
+        "spread": float((loads.max() - loads.min()) / mean),
+        "peak_to_mean": float(loads.max() / mean),
+        "cv": float(loads.std() / mean)
+    }
+
+
+def simulate(engine, key_hashes, counts, events, initial_nodes, seed=0):
+    """Apply each event to the engine and measure remapping and load after it"""
+    rng = random.Random(seed)
+    total = counts.sum()
+    next_node = initial_nodes
+    for node_id in range(initial_nodes):
+        engine.add_node(node_id)
+
+    owners = engine.get_nodes_for_hashes(key_hashes)
+    steps = [dict(step=0, event="initial", remapped=0.0, **load_stats(owners, counts, engine.get_nodes()))]
+    for step, (action, argument) in enumerate(events, start=1):
+        if action == "add":
+            engine.add_node(next_node)
+            label = f"add {next_node}"
+            next_node += 1
+        elif action == "remove":
+            node = argument if argument is not None else rng.choice(engine.get_nodes())
+            if not engine.remove_node(node):
+                raise ValueError(f"Cannot remove node {node}: not on the ring")
+            label = f"remove {node}"
+        else:
+            node, weight = argument
+            if not engine.set_weight(node, weight):
+                raise ValueError(f"Cannot reweight node {node}: not on the ring")
+            label = f"weight {node}={weight:g}"
+
+        new_owners = engine.get_nodes_for_hashes(key_hashes)
+        remapped = counts[owners != new_owners].sum() / total
+        owners = new_owners
+        steps.append(dict(step=step, event=label, remapped=float(remapped),
+                          **load_stats(owners, counts, engine.get_nodes())))
+    members = sorted(engine.get_nodes())
+    return steps, dict(zip(members, node_loads(owners, counts, members)))
+
+
+def plot(steps, final_loads, prefix):
+    """Load distribution, scalability and key movement charts in the analysis scripts' style"""
+    nodes = sorted(final_loads)  # node -> requests, including nodes that own no keys
+    plt.figure(figsize=(10, 6))
+    bars = plt.bar([f"Node {n}" for n in nodes], [final_loads[n] for n in nodes],
+                   color=['#FF6B6B', '#4ECDC4', '#45B7D1'])
+    plt.title(f'Load Distribution Across {len(nodes)} Nodes\n(after {steps[-1]["event"]})')
+    plt.xlabel('Node')
+    plt.ylabel('Number of Requests')
+    plt.grid(axis='y', alpha=0.3)
+    for bar in bars:
+        plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f'{bar.get_height():.0f}',
+                 ha='center', va='bottom')
+    plt.tight_layout()
+    plt.savefig(f'results/{prefix}load_distribution.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
+    labels = [s["event"] for s in steps]
+    plt.figure(figsize=(10, 6))
+    plt.plot(range(len(steps)), [s["mean_load"] for s in steps], marker='o', linewidth=2, markersize=8, color='#FF6B6B')
+    for x, s in enumerate(steps):
+        plt.annotate(f'{s["nodes"]}', (x, s["mean_load"]), textcoords="offset points", xytext=(0, 10), ha='center')
+    plt.title('Average Load per Node After Each Event\n(labels: number of nodes)')
+    plt.xticks(range(len(steps)), labels, rotation=45, ha='right')
+    plt.ylabel('Average Load per Node')
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(f'results/{prefix}scalability.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
+    fig, ax_moved = plt.subplots(figsize=(12, 6))
+    ax_moved.bar(range(len(steps)), [s["remapped"] * 100 for s in steps], color='#4ECDC4', label='Keys remapped')
+    ax_moved.set_ylabel('Requests Remapped (%)')
+    ax_peak = ax_moved.twinx()
+    ax_peak.plot(range(len(steps)), [s["peak_to_mean"] for s in steps], marker='o', color='#FF6B6B', label='Peak-to-mean')
+    ax_peak.set_ylabel('Peak-to-Mean Load')
+    ax_moved.set_xticks(range(len(steps)))
+    ax_moved.set_xticklabels(labels, rotation=45, ha='right')
+    ax_moved.set_title('Key Movement and Load Imbalance per Membership Event')
+    ax_moved.grid(axis='y', alpha=0.3)
+    fig.legend(loc='upper right')
+    fig.tight_layout()
+    fig.savefig(f'results/{prefix}key_movement.png', dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', default='zipf', help="uniform, zipf, or a JSON-lines file of requests")
+    parser.add_argument('--key-field', default='request_id', help="field holding the key in each JSON line")
+    parser.add_argument('--num-keys', type=int, default=1_000_000, help="requests to generate")
+    parser.add_argument('--key-space', type=int, default=None, help="distinct keys to draw from (default: --num-keys)")
+    parser.add_argument('--zipf-s', type=float, default=1.1)
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='ring')
+    parser.add_argument('--nodes', type=int, default=3, help="nodes before the first event")
+    parser.add_argument('--events', default=DEFAULT_EVENTS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="write the per-step results to this file")
+    parser.add_argument('--plot', action='store_true', help="save charts under results/")
+    parser.add_argument('--prefix', default='churn_', help="file name prefix for the charts")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.keys in ("uniform", "zipf"):
+        key_hashes, counts = generate_keys(args.keys, args.num_keys, args.key_space or args.num_keys,
+                                           args.zipf_s, args.seed)
+    else:
+        key_hashes, counts = load_keys(args.keys, args.key_field)
+    print(f"{counts.sum()} requests over {len(key_hashes)} distinct keys ({time.perf_counter() - start:.2f}s)")
+
+    start = time.perf_counter()
+    try:
+        steps, final_loads = simulate(ENGINES[args.engine](), key_hashes, counts, parse_events(args.events),
+                                      args.nodes, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+
+    print(f"{'step':>4} {'event':<14} {'nodes':>5} {'remapped':>9} {'peak/mean':>9} {'spread':>7} {'cv':>6}")
+    for s in steps:
+        print(f"{s['step']:4d} {s['event']:<14} {s['nodes']:5d} {s['remapped'] * 100:8.2f}% "
+              f"{s['peak_to_mean']:9.3f} {s['spread']:7.3f} {s['cv']:6.3f}")
+    print(f"{len(steps) - 1} events simulated with the {args.engine} engine in {elapsed:.2f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"engine": args.engine, "requests": int(counts.sum()), "steps": steps}, f, indent=2)
+    if args.plot:
+        os.makedirs('results', exist_ok=True)
+        plot(steps, final_loads, args.prefix)
+    return steps
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Open-loop load generator for the load balancer.
+
+Requests are sent on a fixed schedule (a constant rate, or steps of rates)
+whether or not earlier ones have finished, with at most --concurrency in
+flight. Latency is measured from each request's scheduled send time, not from
+when it actually went out, so time spent waiting behind a slow response or a
+full connection limit counts against the system instead of being silently
+skipped (coordinated omission). Service time, measured from the actual send,
+is reported alongside for comparison.
+
+    python load_generator.py --rate 500 --duration 30
+    python load_generator.py --steps 200:10,400:10,800:10 --keys 1000 --json results/load_test.json --plot
+
+The JSON output is picked up by analysis.py for its report.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+import aiohttp
+import matplotlib.pyplot as plt
+import numpy as np
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+class LatencyHistogram:
+    """HDR-style histogram of integer microsecond values.
+
+    Values keep their top `precision_bits` significant bits, so every bucket
+    is within 1 / 2**precision_bits (under 1% by default) of the values in it,
+    while the whole range from 1µs to hours needs only a few thousand buckets.
+    """
+
+    def __init__(self, precision_bits=7):
+        self.precision_bits = precision_bits
+        self.counts = defaultdict(int)  # bucket lower bound -> count
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def _bucket(self, value):
+        shift = max(0, value.bit_length() - self.precision_bits)
+        return (value >> shift) << shift, (1 << shift) - 1
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1e6))
+        self.counts[self._bucket(value)[0]] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Highest value equivalent to the q-th percentile, in milliseconds"""
+        if not self.total:
+            return float('nan')
+        rank = max(1, int(np.ceil(q / 100 * self.total)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(bucket + self._bucket(bucket)[1], self.max) / 1000
+        return self.max / 1000
+
+    def summary(self):
+        """Mean, max and the standard percentiles, in milliseconds"""
+        stats = {f"p{q:g}": self.percentile(q) for q in PERCENTILES}
+        stats["mean"] = self.sum / self.total / 1000 if self.total else float('nan')
+        stats["max"] = self.max / 1000
+        return stats
+
+    def to_list(self):
+        """[bucket lower bound in µs, count] pairs, for re-plotting the full distribution"""
+        return [[bucket, self.counts[bucket]] for bucket in sorted(self.counts)]
+
+
+def parse_steps(spec):
+    """Parse "200:10,400:10" into [(rate per second, duration in seconds)]"""
+    steps = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        rate, _, duration = entry.partition(':')
+        steps.append((float(rate), float(duration)))
+    return steps
+
+
+def schedule(steps, poisson=False, seed=0):
+    """Intended send offsets in seconds from the start, with the step each one belongs to"""
+    rng = np.random.default_rng(seed)
+    offsets, step_ids = [], []
+    step_start = 0.0
+    for step_id, (rate, duration) in enumerate(steps):
+        count = int(rate * duration)
+        if poisson:
+            times = np.cumsum(rng.exponential(1 / rate, count))
+            times = times[times < duration]
+        else:
+            times = np.arange(count) / rate
+        offsets.append(step_start + times)
+        step_ids.append(np.full(len(times), step_id))
+        step_start += duration
+    return np.concatenate(offsets), np.concatenate(step_ids)
+
+
+def backend_of(body):
+    """Server name from a backend's "Hello from Server: X" response"""
+    message = body.get('message', '') if isinstance(body, dict) else ''
+    return message.split('Server: ')[1] if 'Server: ' in message else None
+
+
+class LoadGenerator:
+    """Drives lb_url/path on a fixed schedule and collects latency, errors and backends"""
+
+    def __init__(self, lb_url, path="home", concurrency=256, timeout=10, keys=0, key_header="X-Request-Key"):
+        self.url = f"{lb_url.rstrip('/')}/{path.lstrip('/')}"
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.keys = keys
+        self.key_header = key_header
+
+    async def _send(self, session, slots, intended, step, results):
+        async with slots:
+            sent = time.perf_counter()
+            headers = {self.key_header: f"user-{random.randrange(self.keys)}"} if self.keys else None
+            try:
+                async with session.get(self.url, headers=headers) as response:
+                    body = await response.json(content_type=None) if response.status == 200 else None
+                    outcome = None if response.status < 400 else f"http_{response.status}"
+            except asyncio.TimeoutError:
+                body, outcome = None, "timeout"
+            except aiohttp.ClientError:
+                body, outcome = None, "connection"
+            except ValueError:
+                body, outcome = None, "bad_response"
+            done = time.perf_counter()
+        results.append((step, done - intended, done - sent, outcome, backend_of(body)))
+
+    async def run(self, steps, poisson=False):
+        """Send the whole schedule and return the collected results"""
+        offsets, step_ids = schedule(steps, poisson)
+        slots = asyncio.Semaphore(self.concurrency)
+        results = []
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        tasks = []
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            start = time.perf_counter()
+            for offset, step in zip(offsets.tolist(), step_ids.tolist()):
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Never wait for earlier requests here: the schedule must not slow down with the system
+                tasks.append(asyncio.create_task(self._send(session, slots, start + offset, step, results)))
+            dispatch_lag = time.perf_counter() - (start + (offsets[-1] if len(offsets) else 0))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        return self.report(steps, results, elapsed, dispatch_lag)
+
+    def report(self, steps, results, elapsed, dispatch_lag):
+        latency, service = LatencyHistogram(), LatencyHistogram()
+        step_latency = [LatencyHistogram() for _ in steps]
+        step_errors = [0] * len(steps)
+        backend_latency = defaultdict(LatencyHistogram)
+        errors = defaultdict(int)
+        for step, response_time, service_time, outcome, backend in results:
+            latency.record(response_time)
+            service.record(service_time)
+            step_latency[step].record(response_time)
+            if outcome is not None:
+                errors[outcome] += 1
+                step_errors[step] += 1
+            elif backend is not None:
+                backend_latency[backend].record(response_time)
+
+        total = len(results)
+        succeeded = sum(h.total for h in backend_latency.values())
+        return {
+            "url": self.url,
+            "concurrency": self.concurrency,
+            "steps": [dict(rate=rate, duration=duration, requests=h.total, errors=e,
+                           error_rate=e / h.total if h.total else 0.0, latency_ms=h.summary())
+                      for (rate, duration), h, e in zip(steps, step_latency, step_errors)],
+            "requests": total,
+            "elapsed_s": elapsed,
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "dispatch_lag_s": dispatch_lag,
+            "errors": dict(errors),
+            "error_rate": sum(errors.values()) / total if total else 0.0,
+            "latency_ms": latency.summary(),
+            "service_time_ms": service.summary(),
+            "backends": {name: {"requests": h.total, "share": h.total / succeeded, "latency_ms": h.summary()}
+                         for name, h in sorted(backend_latency.items())},
+            "histogram_us": latency.to_list()
+        }
+
+
+def print_report(report):
+    print(f"{report['requests']} requests in {report['elapsed_s']:.1f}s ({report['throughput_rps']:.1f} req/s), "
+          f"error rate {report['error_rate'] * 100:.2f}% {report['errors'] or ''}")
+    if report['dispatch_lag_s'] > 0.1:
+        print(f"Warning: the generator fell {report['dispatch_lag_s']:.2f}s behind its schedule; "
+              f"latencies include that lag")
+    for label, stats in [("Response time", report['latency_ms']), ("Service time", report['service_time_ms'])]:
+        print(f"{label:>13}: " + " | ".join(f"{name} {value:.2f} ms" for name, value in stats.items()))
+    for step in report['steps']:
+        stats = step['latency_ms']
+        print(f"  {step['rate']:8.1f} req/s for {step['duration']:g}s: p50 {stats['p50']:.2f} ms | "
+              f"p99 {stats['p99']:.2f} ms | p99.9 {stats['p99.9']:.2f} ms | errors {step['errors']}")
+    for name, backend in report['backends'].items():
+        print(f"  {name}: {backend['requests']} requests ({backend['share'] * 100:.1f}%) | "
+              f"p99 {backend['latency_ms']['p99']:.2f} ms")
+
+
+def plot(report, path='results/load_test_latency.png'):
+    """Latency by percentile on the usual HDR axis, which stretches out the tail"""
+    buckets = np.array(report['histogram_us'], dtype=np.float64).reshape(-1, 2)
+    if not len(buckets):
+        return
+    quantiles = np.cumsum(buckets[:, 1]) / buckets[:, 1].sum()
+    spread = 1 / np.maximum(1 - quantiles, 1e-6)
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(spread, buckets[:, 0] / 1000, linewidth=2, color='#FF6B6B', label='Response time')
+    ticks = [1, 2, 10, 100, 1000, 10000]
+    plt.xscale('log')
+    plt.xticks(ticks, ['0%', '50%', '90%', '99%', '99.9%', '99.99%'])
+    plt.title(f'Latency by Percentile\n({report["requests"]} requests, open loop, '
+              f'{report["throughput_rps"]:.0f} req/s)')
+    plt.xlabel('Percentile')
+    plt.ylabel('Latency (ms)')
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5050', help="load balancer base URL")
+    parser.add_argument('--path', default='home')
+    parser.add_argument('--rate', type=float, default=200, help="requests per second")
+    parser.add_argument('--duration', type=float, default=30, help="seconds at --rate")
+    parser.add_argument('--steps', help="RATE:SECONDS,... instead of --rate/--duration")
+    parser.add_argument('--poisson', action='store_true', help="exponential inter-arrival times instead of fixed")
+    parser.add_argument('--concurrency', type=int, default=256, help="requests in flight at most")
+    parser.add_argument('--timeout', type=float, default=10, help="seconds per request")
+    parser.add_argument('--keys', type=int, default=0, help="distinct routing keys to send (0: none)")
+    parser.add_argument('--key-header', default='X-Request-Key')
+    parser.add_argument('--json', help="write the report to this file")
+    parser.add_argument('--plot', action='store_true', help="save a latency percentile chart under results/")
+    args = parser.parse_args(argv)
+
+    steps = parse_steps(args.steps) if args.steps else [(args.rate, args.duration)]
+    generator = LoadGenerator(args.url, args.path, args.concurrency, args.timeout, args.keys, args.key_header)
+    report = asyncio.run(generator.run(steps, args.poisson))
+    print_report(report)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.plot:
+        os.makedirs('results', exist_ok=True)
+        plot(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
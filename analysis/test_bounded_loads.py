@@ -0,0 +1,84 @@
+import heapq
+import os
+import random
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'load_balancer'))
+from consistent_hash import HashRing
+
+EPSILONS = [None, 1.0, 0.5, 0.25, 0.1]
+
+
+def simulate(keys, num_servers, epsilon, concurrency, seed=42):
+    """Replay keys as overlapping requests and track in-flight load per node"""
+    rng = random.Random(seed)
+    hr = HashRing(num_nodes=num_servers, replicas=100, token_bits=64)
+    loads = {node_id: 0 for node_id in hr.get_nodes()}
+    completions = []  # heap of (finish_time, node_id)
+    now = 0.0
+    peak_load = 0
+    max_mean_ratios = []
+
+    for key in keys:
+        # Poisson arrivals with unit mean service time keep `concurrency` requests in flight on average
+        now += rng.expovariate(concurrency)
+        while completions and completions[0][0] <= now:
+            loads[heapq.heappop(completions)[1]] -= 1
+
+        if epsilon is None:
+            node_id = hr.get_node_for_request(key)
+        else:
+            node_id = hr.get_bounded_preference_list(key, 1, loads, epsilon)[0]
+        loads[node_id] += 1
+        heapq.heappush(completions, (now + rng.expovariate(1.0), node_id))
+
+        peak_load = max(peak_load, loads[node_id])
+        max_mean_ratios.append(max(loads.values()) / (sum(loads.values()) / num_servers))
+
+    return {'peak_load': peak_load, 'mean_max_to_avg': float(np.mean(max_mean_ratios))}
+
+
+def test_bounded_loads(num_requests=200000, num_keys=100000, num_servers=10, concurrency=200, zipf_s=1.1):
+    """Compare max per-node load with and without bounded loads on a Zipfian key stream"""
+    print(f"Starting bounded-load simulation: {num_requests} requests, {num_servers} servers, "
+          f"~{concurrency} in flight, Zipf s={zipf_s}...")
+
+    keys = np.random.default_rng(42).zipf(zipf_s, size=num_requests * 3)
+    keys = [f"key-{k}" for k in keys[keys <= num_keys][:num_requests].tolist()]
+
+    results = []
+    for epsilon in EPSILONS:
+        label = "Plain ring" if epsilon is None else f"ε = {epsilon}"
+        stats = simulate(keys, num_servers, epsilon, concurrency)
+        results.append((label, stats))
+        print(f"  {label:<12} peak in-flight on one node: {stats['peak_load']:4d} | "
+              f"mean max/avg load: {stats['mean_max_to_avg']:.2f}")
+
+    labels = [label for label, _ in results]
+    ratios = [stats['mean_max_to_avg'] for _, stats in results]
+
+    plt.figure(figsize=(10, 6))
+    bars = plt.bar(labels, ratios, color=['#FF6B6B'] + ['#4ECDC4'] * (len(labels) - 1))
+    plt.axhline(1.0, color='black', linewidth=0.8)
+    plt.title(f'Max/Average In-Flight Load with Bounded Loads\n({num_requests} Zipfian Requests, {num_servers} Servers)')
+    plt.ylabel('Mean Max/Average Load')
+    plt.grid(axis='y', alpha=0.3)
+
+    for bar, ratio in zip(bars, ratios):
+        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.02,
+                 f"{ratio:.2f}", ha='center', va='bottom')
+
+    plt.tight_layout()
+    plt.savefig('results/bounded_loads.png', dpi=300, bbox_inches='tight')
+    plt.show()
+
+    return results
+
+
+if __name__ == "__main__":
+    os.makedirs('results', exist_ok=True)
+
+    test_bounded_loads()
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'load_balancer'))
+from consistent_hash import HASH_FUNCTIONS, HashRing, xxhash
+
+# (label, HashRing kwargs) for every ring layout compared
+RING_CONFIGS = [
+    ("512 slots", {"ring_size": 512}),
+    ("64-bit tokens", {"token_bits": 64}),
+]
+
+
+def measure_distribution(hash_function, ring_kwargs, num_nodes, replicas, request_ids):
+    """Route every request ID and summarise how evenly the nodes are loaded"""
+    hr = HashRing(num_nodes=num_nodes, replicas=replicas, hash_function=hash_function, **ring_kwargs)
+
+    start_time = time.time()
+    load = np.array(list(hr.get_load_distribution(request_ids).values()))
+    elapsed = time.time() - start_time
+
+    return {
+        'max_min_ratio': load.max() / load.min() if load.min() > 0 else float('inf'),
+        'std_per_node': load.std(),
+        'std_percent': load.std() / load.mean() * 100,
+        'keys_per_second': len(request_ids) / elapsed
+    }
+
+
+def test_hash_functions(num_keys=1000000, num_nodes=3, replica_counts=(9, 100)):
+    """Compare load balance of each hash function for H and Phi over num_keys requests"""
+    print(f"Starting hash function comparison with {num_keys} keys on N={num_nodes} nodes...")
+
+    hash_functions = ["quadratic"] + [name for name in HASH_FUNCTIONS if name != "xxhash" or xxhash]
+    request_ids = np.random.default_rng(42).integers(0, 2 ** 40, size=num_keys)
+    results = []
+
+    for ring_label, ring_kwargs in RING_CONFIGS:
+        for replicas in replica_counts:
+            if "ring_size" in ring_kwargs and num_nodes * replicas > ring_kwargs["ring_size"]:
+                continue
+            print(f"\n--- {ring_label}, {replicas} virtual servers per node ---")
+            print(f"{'Hash':<12} {'Max/Min':>8} {'Std/node':>10} {'Std %':>7} {'Keys/s':>12}")
+
+            for hash_function in hash_functions:
+                if hash_function == "quadratic" and "token_bits" in ring_kwargs:
+                    continue  # The quadratic H never leaves the bottom of a 64-bit space
+                stats = measure_distribution(hash_function, ring_kwargs, num_nodes, replicas, request_ids)
+                print(f"{hash_function:<12} {stats['max_min_ratio']:>8.2f} {stats['std_per_node']:>10.1f} "
+                      f"{stats['std_percent']:>6.1f}% {stats['keys_per_second']:>12,.0f}")
+                results.append({'hash_function': hash_function, 'ring': ring_label,
+                                'replicas': replicas, **stats})
+
+    if not xxhash:
+        print("\nxxhash not installed - skipped (pip install xxhash)")
+
+    # Create grouped bar chart of max/min load ratio
+    labels = sorted({(r['ring'], r['replicas']) for r in results}, key=lambda x: (x[0], x[1]))
+    width = 0.8 / len(hash_functions)
+
+    plt.figure(figsize=(12, 6))
+    for offset, hash_function in enumerate(hash_functions):
+        ratios = {(r['ring'], r['replicas']): r['max_min_ratio'] for r in results if r['hash_function'] == hash_function}
+        xs = [i + offset * width for i, label in enumerate(labels) if label in ratios]
+        ys = [min(ratios[label], 10) for label in labels if label in ratios]
+        plt.bar(xs, ys, width, label=hash_function)
+    plt.xticks([i + 0.4 - width / 2 for i in range(len(labels))],
+               [f"{ring}\n{replicas} vnodes" for ring, replicas in labels])
+    plt.axhline(1.0, color='black', linewidth=0.8)
+    plt.title(f'Max/Min Load Ratio per Hash Function\n({num_keys} Keys, N={num_nodes}, capped at 10)')
+    plt.ylabel('Max/Min Load Ratio (lower is better)')
+    plt.legend()
+    plt.grid(axis='y', alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig('results/hash_functions.png', dpi=300, bbox_inches='tight')
+    plt.show()
+
+    return results
+
+
+if __name__ == "__main__":
+    os.makedirs('results', exist_ok=True)
+
+    test_hash_functions()
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import aiohttp
+import matplotlib.pyplot as plt
+import numpy as np
+
+# Run the Flask load balancer on 5050 and async_proxy.py on 5051 (both against the same servers)
+TARGETS = {
+    "Flask + requests": "http://localhost:5050",
+    "asyncio + aiohttp": "http://localhost:5051",
+}
+
+
+async def client_loop(session, url, deadline, latencies, errors):
+    """One simulated client: send requests back to back until the deadline"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    continue
+        except Exception:
+            errors.append(None)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure(lb_url, concurrency, duration):
+    """Drive lb_url with `concurrency` clients for `duration` seconds"""
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=30)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*[client_loop(session, f"{lb_url}/home", deadline, latencies, errors)
+                               for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50_ms': np.percentile(latencies, 50) * 1000 if latencies else float('nan'),
+        'p99_ms': np.percentile(latencies, 99) * 1000 if latencies else float('nan'),
+        'errors': len(errors)
+    }
+
+
+async def test_proxy_throughput(targets=TARGETS, concurrencies=(1000, 10000), duration=30):
+    """Compare RPS and p99 latency of the proxy implementations at each concurrency level"""
+    print("Starting proxy throughput comparison...")
+    results = {name: [] for name in targets}
+
+    for concurrency in concurrencies:
+        for name, lb_url in targets.items():
+            print(f"\n--- {name} with {concurrency} concurrent clients ---")
+            stats = await measure(lb_url, concurrency, duration)
+            results[name].append(stats)
+            print(f"RPS: {stats['rps']:.1f} | p50: {stats['p50_ms']:.1f} ms | "
+                  f"p99: {stats['p99_ms']:.1f} ms | errors: {stats['errors']}")
+
+    fig, (ax_rps, ax_p99) = plt.subplots(1, 2, figsize=(14, 6))
+    width = 0.8 / len(targets)
+    xs = np.arange(len(concurrencies))
+
+    for offset, (name, stats) in enumerate(results.items()):
+        ax_rps.bar(xs + offset * width, [s['rps'] for s in stats], width, label=name)
+        ax_p99.bar(xs + offset * width, [s['p99_ms'] for s in stats], width, label=name)
+
+    for ax, title, ylabel in [(ax_rps, 'Throughput', 'Requests per Second'),
+                              (ax_p99, 'p99 Latency', 'Latency (ms)')]:
+        ax.set_title(f'{title} by Concurrent Clients')
+        ax.set_xticks(xs + width * (len(targets) - 1) / 2)
+        ax.set_xticklabels([str(c) for c in concurrencies])
+        ax.set_xlabel('Concurrent Clients')
+        ax.set_ylabel(ylabel)
+        ax.grid(axis='y', alpha=0.3)
+        ax.legend()
+
+    plt.tight_layout()
+    plt.savefig('results/proxy_throughput.png', dpi=300, bbox_inches='tight')
+    plt.show()
+
+    return results
+
+
+if __name__ == "__main__":
+    import os
+    os.makedirs('results', exist_ok=True)
+
+    asyncio.run(test_proxy_throughput())
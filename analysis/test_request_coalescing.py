@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'load_balancer'))
+from consistent_hash import HashRing
+from single_flight import AsyncSingleFlight
+
+
+async def burst(keys, arrivals, service_time, coalesce, num_servers=3):
+    """Fire keyed GETs at their arrival offsets against backends that take service_time per call.
+
+    Returns upstream calls per node and the client-side latencies.
+    """
+    hr = HashRing(num_nodes=num_servers, replicas=100, token_bits=64)
+    upstream_calls = {node_id: 0 for node_id in hr.get_nodes()}
+    single_flight = AsyncSingleFlight() if coalesce else None
+    latencies = []
+
+    async def upstream(node_id):
+        upstream_calls[node_id] += 1
+        await asyncio.sleep(service_time)
+        return b'{"status": "successful"}'
+
+    async def client(key, delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        node_id = hr.get_node_for_request(key)
+        if single_flight is None:
+            await upstream(node_id)
+        else:
+            await single_flight.do(("GET", "/home", (), key), lambda: upstream(node_id))
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[client(key, delay) for key, delay in zip(keys, arrivals)])
+    return upstream_calls, latencies
+
+
+def test_request_coalescing(num_requests=10000, num_keys=(10, 100, 1000, 10000), window=1.0, service_time=0.05):
+    """Backend calls with and without single-flight for a burst of identical-key GETs"""
+    print(f"Starting request coalescing benchmark: {num_requests} requests in a {window}s burst...")
+    rng = np.random.default_rng(11)
+    arrivals = np.sort(rng.uniform(0, window, num_requests)).tolist()
+
+    results = {"Direct": [], "Single-flight": []}
+    for keys_in_burst in num_keys:
+        keys = [f"user-{key}" for key in rng.integers(0, keys_in_burst, num_requests).tolist()]
+        print(f"\n--- {keys_in_burst} distinct keys ---")
+        for label, coalesce in [("Direct", False), ("Single-flight", True)]:
+            upstream_calls, latencies = asyncio.run(burst(keys, arrivals, service_time, coalesce))
+            total = sum(upstream_calls.values())
+            results[label].append(total)
+            print(f"{label}: {total} backend calls ({(1 - total / num_requests) * 100:.1f}% coalesced) | "
+                  f"per node: {list(upstream_calls.values())} | p99: {np.percentile(latencies, 99) * 1000:.1f} ms")
+
+    xs = np.arange(len(num_keys))
+    plt.figure(figsize=(10, 6))
+    for offset, (label, totals) in enumerate(results.items()):
+        plt.bar(xs + offset * 0.4, totals, 0.4, label=label)
+    plt.title(f'Backend Calls for a Burst of {num_requests} GETs')
+    plt.xticks(xs + 0.2, [str(k) for k in num_keys])
+    plt.xlabel('Distinct Routing Keys in Burst')
+    plt.ylabel('Backend Calls')
+    plt.grid(axis='y', alpha=0.3)
+    plt.legend()
+    plt.savefig('results/request_coalescing.png', dpi=300, bbox_inches='tight')
+    plt.show()
+
+    return results
+
+
+if __name__ == "__main__":
+    os.makedirs('results', exist_ok=True)
+
+    test_request_coalescing()
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'load_balancer'))
+from consistent_hash import HashRing
+from response_cache import ResponseCache
+
+BODY = b'{"message": "Hello from Server: ServerX", "status": "successful"}'
+
+
+def simulate(key_stream, cache_size, ttl, rate=2000, num_servers=5, remove_at=0.5):
+    """Replay keyed GETs at `rate` req/s through the ring and cache; return upstream requests sent.
+
+    One server leaves the ring part way through, dropping everything it served from the cache.
+    """
+    hr = HashRing(num_nodes=num_servers, replicas=100, token_bits=64)
+    cache = ResponseCache(max_entries=cache_size, default_ttl=ttl) if cache_size else None
+    upstream = 0
+
+    for i, key in enumerate(key_stream):
+        now = i / rate
+        if i == int(len(key_stream) * remove_at):
+            node_id = hr.get_nodes()[0]
+            hr.remove_node(node_id)
+            if cache is not None:
+                cache.invalidate_node(node_id)
+
+        cache_key = ("GET", "/home", (), key)
+        if cache is not None and cache.get(cache_key, now) is not None:
+            continue
+        upstream += 1
+        if cache is not None:
+            cache.put(cache_key, hr.get_node_for_request(key), BODY, 200, None, now)
+
+    return upstream, cache.stats() if cache is not None else None
+
+
+def test_response_cache(num_requests=200000, num_keys=50000, cache_sizes=(0, 100, 1000, 10000), ttls=(1, 10, 60)):
+    """Upstream traffic saved by the response cache across cache sizes and TTLs"""
+    print(f"Starting response cache simulation with {num_requests} requests over {num_keys} keys...")
+
+    # Zipfian key popularity, so a small cache catches most of the traffic
+    key_stream = np.random.default_rng(7).zipf(1.1, size=num_requests * 2)
+    key_stream = [f"user-{key}" for key in key_stream[key_stream <= num_keys][:num_requests].tolist()]
+
+    saved = {ttl: [] for ttl in ttls}
+    for ttl in ttls:
+        for cache_size in cache_sizes:
+            upstream, stats = simulate(key_stream, cache_size, ttl)
+            saved[ttl].append(1 - upstream / len(key_stream))
+            detail = (f" | evictions: {stats['evictions']} | expirations: {stats['expirations']} | "
+                      f"invalidated: {stats['invalidations']}") if stats else ""
+            print(f"  TTL {ttl:3d}s, cache {cache_size:6d}: {upstream:7d} upstream requests "
+                  f"({saved[ttl][-1] * 100:.1f}% saved){detail}")
+
+    plt.figure(figsize=(10, 6))
+    for ttl, fractions in saved.items():
+        plt.plot([str(size) for size in cache_sizes], [f * 100 for f in fractions], marker='o', label=f'TTL {ttl}s')
+    plt.title('Upstream Requests Saved by the Response Cache')
+    plt.xlabel('Cache Size (entries)')
+    plt.ylabel('Requests Served from Cache (%)')
+    plt.grid(alpha=0.3)
+    plt.legend()
+    plt.savefig('results/response_cache.png', dpi=300, bbox_inches='tight')
+    plt.show()
+
+    return saved
+
+
+if __name__ == "__main__":
+    os.makedirs('results', exist_ok=True)
+
+    test_response_cache()
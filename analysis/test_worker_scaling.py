@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+import time
+
+import matplotlib.pyplot as plt
+import requests
+
+from test_proxy_throughput import measure
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'load_balancer'))
+from local_fleet import LocalFleet
+
+WORKER_COUNTS = sorted({1, 2, 4, os.cpu_count() or 1})
+PORT = 5600
+
+
+def check_propagation(num_workers, port=PORT):
+    """Add a server through one worker, then time until every worker routes with the new ring"""
+    lb_url = f'http://127.0.0.1:{port}'
+    target = requests.post(f'{lb_url}/add', json={'n': 1}).json()['message']['ring_version']
+    start = time.perf_counter()
+    seen = {}
+    while len(seen) < num_workers and time.perf_counter() - start < 10:
+        status = requests.get(f'{lb_url}/rep').json()['message']
+        if status['ring_version'] >= target:
+            seen.setdefault(status['worker'], time.perf_counter() - start)
+    return target, seen
+
+
+async def test_worker_scaling(worker_counts=WORKER_COUNTS, concurrency=256, duration=15):
+    """RPS through workers.py as worker processes are added, one per core at most"""
+    print(f"Starting worker scaling benchmark on {os.cpu_count()} CPUs...")
+    results = []
+    for num_workers in worker_counts:
+        print(f"\n--- {num_workers} worker(s) ---")
+        with LocalFleet(port=PORT, mode="workers", workers=num_workers, env={"HEALTH_CHECK_INTERVAL": "0"}) as fleet:
+            stats = await measure(fleet.url, concurrency, duration)
+            version, seen = check_propagation(num_workers)
+        results.append(stats)
+        print(f"RPS: {stats['rps']:.1f} | p50: {stats['p50_ms']:.1f} ms | p99: {stats['p99_ms']:.1f} ms | "
+              f"errors: {stats['errors']}")
+        print(f"/add published ring version {version}; workers serving it: {len(seen)}/{num_workers}")
+
+    baseline = results[0]['rps'] / worker_counts[0]
+    plt.figure(figsize=(10, 6))
+    plt.plot(worker_counts, [s['rps'] for s in results], marker='o', linewidth=2, markersize=8,
+             color='#FF6B6B', label='Measured')
+    plt.plot(worker_counts, [baseline * n for n in worker_counts], linestyle='--', color='#45B7D1',
+             label='Linear scaling')
+    plt.title(f'Load Balancer Throughput by Worker Processes\n({concurrency} concurrent clients, '
+              f'{os.cpu_count()} CPUs; the client shares the machine)')
+    plt.xlabel('Worker Processes')
+    plt.ylabel('Requests per Second')
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    plt.savefig('results/worker_scaling.png', dpi=300, bbox_inches='tight')
+    plt.show()
+
+    return results
+
+
+if __name__ == "__main__":
+    os.makedirs('results', exist_ok=True)
+
+    asyncio.run(test_worker_scaling())
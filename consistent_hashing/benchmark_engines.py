@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from lookup_engines import ENGINES
+
+NODE_COUNTS = [5, 50, 200]
+NUM_LOOKUPS = 20000
+NUM_KEYS = 200000
+
+
+def build(name, num_nodes):
+    engine = ENGINES[name]()
+    for node_id in range(num_nodes):
+        engine.add_node(node_id)
+    return engine
+
+
+def benchmark_engine(name, num_nodes):
+    """Lookup cost, rebuild cost, memory, balance and key movement for one engine and fleet size"""
+    engine = build(name, num_nodes)
+
+    # Memory of one published version: the copy plus whatever the membership change rebuilds
+    tracemalloc.start()
+    version = engine.copy()
+    version.add_node(num_nodes)
+    memory_kb = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    del version
+
+    keys = [f"user-{i}" for i in range(NUM_LOOKUPS)]
+    lookup_ns = timeit.timeit(lambda: [engine.get_node_for_request(key) for key in keys], number=1) / NUM_LOOKUPS * 1e9
+
+    # Membership change as the load balancer makes it: copy the published engine, then add a node
+    add_ms = timeit.timeit(lambda: engine.copy().add_node(num_nodes), number=3) / 3 * 1000
+
+    request_ids = np.arange(NUM_KEYS)
+    owners = engine.get_nodes_for_requests(request_ids)
+    counts = np.bincount(owners, minlength=num_nodes)
+    balance = counts.max() / counts.mean()
+
+    grown = engine.copy()
+    grown.add_node(num_nodes)
+    moved_add = (grown.get_nodes_for_requests(request_ids) != owners).mean() * 100
+    shrunk = engine.copy()
+    shrunk.remove_node(0)
+    moved_remove = (shrunk.get_nodes_for_requests(request_ids) != owners).mean() * 100
+
+    print(f"{name:>10} {num_nodes:5d} nodes: lookup {lookup_ns:7.0f} ns/op | add node {add_ms:8.2f} ms | "
+          f"memory {memory_kb:8.0f} KiB | max/mean {balance:5.3f} | "
+          f"moved on add {moved_add:5.2f}% (ideal {100 / (num_nodes + 1):5.2f}%) | "
+          f"on remove {moved_remove:5.2f}% (ideal {100 / num_nodes:5.2f}%)")
+
+
+if __name__ == "__main__":
+    print(f"=== Lookup Engine Benchmark ({NUM_LOOKUPS} scalar lookups, {NUM_KEYS} keys for balance) ===")
+    for n in NODE_COUNTS:
+        for name in ENGINES:
+            benchmark_engine(name, n)
+        print()
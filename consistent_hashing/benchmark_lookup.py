@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import random
+import timeit
+
+from consistent_hash import HashRing
+
+RING_SIZE = 8192
+REPLICAS = 9
+NODE_COUNTS = [3, 50, 500]
+NUM_LOOKUPS = 20000
+
+
+def linear_probe_lookup(hr, request_id):
+    """Reference lookup: walk the ring slot by slot until an occupied slot is found"""
+    slot = hr.H(request_id)
+    for i in range(hr.ring_size):
+        current_slot = (slot + i) % hr.ring_size
+        if hr.ring[current_slot] is not None:
+            return hr.ring[current_slot]
+    return None
+
+
+def benchmark_lookup(num_nodes):
+    """Time linear probing against the owner-table lookup for one ring size"""
+    hr = HashRing(num_nodes=num_nodes, ring_size=RING_SIZE, replicas=REPLICAS)
+    request_ids = [random.randint(100000, 999999) for _ in range(NUM_LOOKUPS)]
+
+    # Both lookups must agree before their timings are worth comparing
+    for req_id in request_ids[:1000]:
+        assert linear_probe_lookup(hr, req_id) == hr.get_node_for_request(req_id)
+
+    linear_time = timeit.timeit(
+        lambda: [linear_probe_lookup(hr, req_id) for req_id in request_ids], number=1)
+    table_time = timeit.timeit(
+        lambda: [hr.get_node_for_request(req_id) for req_id in request_ids], number=1)
+
+    linear_ns = linear_time / NUM_LOOKUPS * 1e9
+    table_ns = table_time / NUM_LOOKUPS * 1e9
+    occupancy = len(hr.sorted_slots) / hr.ring_size * 100
+    print(f"{num_nodes:5d} nodes ({occupancy:5.1f}% occupied): "
+          f"linear {linear_ns:9.0f} ns/op | table {table_ns:7.0f} ns/op | "
+          f"speedup {linear_ns / table_ns:6.1f}x")
+
+
+if __name__ == "__main__":
+    print(f"=== Lookup Benchmark (ring_size={RING_SIZE}, replicas={REPLICAS}) ===")
+    for n in NODE_COUNTS:
+        benchmark_lookup(n)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""HashRing benchmark suite with JSON baselines and regression thresholds.
+
+Measures lookup cost (scalar and batch), ring build time, add_node and
+remove_node latency, memory footprint and load balance for every combination
+of NODE_COUNTS and REPLICAS, on the 64-bit token ring the load balancer uses.
+
+    python benchmark_ring.py --save baselines/ring.json        # record a baseline
+    python benchmark_ring.py --compare baselines/ring.json     # exit 1 on a regression
+
+Timings are the best of several runs, and baselines are only comparable on the
+machine that recorded them, so record one before changing the ring and
+compare against it afterwards.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from consistent_hash import HashRing
+
+NODE_COUNTS = [10, 100, 500]
+REPLICAS = [10, 100]
+NUM_LOOKUPS = 20000
+NUM_BATCH_KEYS = 200000
+REPEATS = 5
+
+# Allowed relative increase over the baseline before a metric counts as a regression
+DEFAULT_THRESHOLDS = {
+    "lookup_ns": 0.25,
+    "batch_lookup_ns": 0.25,
+    "build_ms": 0.25,
+    "add_node_ms": 0.5,  # Sub-millisecond, so noisier
+    "remove_node_ms": 0.5,
+    "memory_kib": 0.1,
+    "max_mean_ratio": 0.02,  # Deterministic for a given hash; any real change shows up
+}
+
+
+def build(num_nodes, replicas):
+    hr = HashRing(num_nodes=0, replicas=replicas, token_bits=64)
+    for node_id in range(num_nodes):
+        hr.add_node(node_id)
+    return hr
+
+
+def best(fn, repeats=REPEATS):
+    """Fastest of `repeats` runs of fn, in seconds"""
+    return min(timeit.repeat(fn, number=1, repeat=repeats))
+
+
+def benchmark_case(num_nodes, replicas, quick=False):
+    """All metrics for one ring shape"""
+    num_lookups = NUM_LOOKUPS // 10 if quick else NUM_LOOKUPS
+    num_batch_keys = NUM_BATCH_KEYS // 10 if quick else NUM_BATCH_KEYS
+    repeats = 2 if quick else REPEATS
+
+    tracemalloc.start()
+    hr = build(num_nodes, replicas)
+    memory_kib = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+
+    build_ms = best(lambda: build(num_nodes, replicas), repeats) * 1000
+
+    keys = [f"user-{i}" for i in range(num_lookups)]
+    lookup_ns = best(lambda: [hr.get_node_for_request(key) for key in keys], repeats) / num_lookups * 1e9
+
+    request_ids = np.arange(num_batch_keys)
+    hr.get_nodes_for_requests(request_ids[:10])  # Build the cached lookup arrays outside the timing
+    batch_lookup_ns = best(lambda: hr.get_nodes_for_requests(request_ids), repeats) / num_batch_keys * 1e9
+
+    # Membership changes as the load balancer makes them, on a copy of the published ring
+    add_times, remove_times = [], []
+    for i in range(repeats * 3):
+        draft = hr.copy()
+        start = time.perf_counter()
+        draft.add_node(num_nodes + i)
+        add_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        draft.remove_node(i % num_nodes)
+        remove_times.append(time.perf_counter() - start)
+
+    counts = np.bincount(hr.get_nodes_for_requests(request_ids), minlength=num_nodes)
+    return {
+        "lookup_ns": lookup_ns,
+        "batch_lookup_ns": batch_lookup_ns,
+        "build_ms": build_ms,
+        "add_node_ms": statistics.median(add_times) * 1000,
+        "remove_node_ms": statistics.median(remove_times) * 1000,
+        "memory_kib": memory_kib,
+        "max_mean_ratio": float(counts.max() / counts.mean()),
+        "cv": float(counts.std() / counts.mean()),
+    }
+
+
+def run_suite(node_counts=NODE_COUNTS, replicas=REPLICAS, quick=False):
+    results = {}
+    for num_nodes in node_counts:
+        for replica_count in replicas:
+            name = f"nodes={num_nodes},replicas={replica_count}"
+            results[name] = stats = benchmark_case(num_nodes, replica_count, quick)
+            print(f"{name:>24}: lookup {stats['lookup_ns']:6.0f} ns | batch {stats['batch_lookup_ns']:5.1f} ns | "
+                  f"build {stats['build_ms']:8.2f} ms | add {stats['add_node_ms']:6.3f} ms | "
+                  f"remove {stats['remove_node_ms']:6.3f} ms | memory {stats['memory_kib']:7.0f} KiB | "
+                  f"max/mean {stats['max_mean_ratio']:.3f}")
+    return {
+        "metadata": {
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, thresholds):
+    """Regressions as (case, metric, baseline value, current value, allowed ratio)"""
+    regressions = []
+    for name, stats in current["results"].items():
+        if name not in baseline["results"]:
+            continue  # New case, nothing to compare against
+        for metric, allowed in thresholds.items():
+            before, after = baseline["results"][name].get(metric), stats.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + allowed):
+                regressions.append((name, metric, before, after, 1 + allowed))
+    return regressions
+
+
+def parse_thresholds(overrides, default=None):
+    """DEFAULT_THRESHOLDS with every metric set to `default` if given, then METRIC=RATIO overrides applied"""
+    thresholds = {metric: default if default is not None else value for metric, value in DEFAULT_THRESHOLDS.items()}
+    for override in overrides:
+        metric, _, value = override.partition('=')
+        if metric not in thresholds:
+            raise ValueError(f"Unknown metric: {metric}")
+        thresholds[metric] = float(value)
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', help="write the results to this baseline file")
+    parser.add_argument('--compare', help="baseline file to check the results against")
+    parser.add_argument('--threshold', type=float, help="allowed relative increase for every metric, e.g. 0.2")
+    parser.add_argument('--metric-threshold', action='append', default=[], metavar='METRIC=RATIO',
+                        help="allowed relative increase for one metric, e.g. lookup_ns=0.1 (repeatable)")
+    parser.add_argument('--nodes', type=int, nargs='+', default=NODE_COUNTS)
+    parser.add_argument('--replicas', type=int, nargs='+', default=REPLICAS)
+    parser.add_argument('--quick', action='store_true', help="fewer keys and repeats, for a fast smoke run")
+    args = parser.parse_args(argv)
+
+    try:
+        thresholds = parse_thresholds(args.metric_threshold, args.threshold)
+    except ValueError as e:
+        parser.error(str(e))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["metadata"].get("quick") != args.quick:
+            parser.error("The baseline was recorded with a different --quick setting")
+
+    scale = 10 if args.quick else 1
+    print(f"=== HashRing Benchmark Suite (token ring, {NUM_LOOKUPS // scale} lookups, "
+          f"{NUM_BATCH_KEYS // scale} batch keys) ===")
+    current = run_suite(args.nodes, args.replicas, args.quick)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(current, baseline, thresholds)
+        if not regressions:
+            print(f"No regressions against {args.compare}")
+            return 0
+        print(f"{len(regressions)} regression(s) against {args.compare}:")
+        for name, metric, before, after, allowed in regressions:
+            print(f"  {name} {metric}: {before:.4g} -> {after:.4g} ({after / before:.2f}x, allowed {allowed:.2f}x)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,112 +1,456 @@
-class HashRing:
-    def __init__(self, num_nodes=3, ring_size=512, replicas=9):
+import bisect
+import hashlib
+import itertools
+import math
+
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+MASK64 = (1 << 64) - 1
+
+
+def blake2b_hash(key):
+    """64-bit hash from a truncated blake2b digest"""
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def fnv1a_hash(key):
+    """64-bit FNV-1a hash of the key's string form"""
+    value = 0xCBF29CE484222325
+    for byte in str(key).encode():
+        value = ((value ^ byte) * 0x100000001B3) & MASK64
+    return value
+
+
+def splitmix64_hash(key):
+    """64-bit SplitMix64 finalizer; integers are mixed directly, other keys go through FNV-1a first"""
+    z = key & MASK64 if isinstance(key, int) else fnv1a_hash(key)
+    z = (z + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def splitmix64_array(keys):
+    """Vectorized SplitMix64 over an int64 array, matching splitmix64_hash"""
+    z = keys.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def blake2b_splitmix64_hash(key):
+    """blake2b for string keys and SplitMix64 for integer ids, so batches of ids vectorize"""
+    if isinstance(key, (int, np.integer)):
+        return splitmix64_hash(int(key))
+    return blake2b_hash(key)
+
+
+def xxhash_hash(key):
+    """64-bit xxHash (XXH3) of the key's string form"""
+    return xxhash.xxh3_64_intdigest(str(key).encode())
+
+
+# Name -> (scalar 64-bit hash, vectorized int64 variant or None)
+HASH_FUNCTIONS = {
+    "blake2b": (blake2b_hash, None),
+    "blake2b+splitmix64": (blake2b_splitmix64_hash, splitmix64_array),
+    "fnv1a": (fnv1a_hash, None),
+    "splitmix64": (splitmix64_hash, splitmix64_array),
+    "xxhash": (xxhash_hash, None),
+}
+# Default for token rings and the other lookup engines. Routing keys and virtual
+# server names are strings and go through blake2b; integer request ids (as in
+# simulations and get_nodes_for_requests batches) use SplitMix64, which numpy can
+# vectorize, instead of a per-id Python loop.
+DEFAULT_HASH_FUNCTION = "blake2b+splitmix64"
+
+
+class Router:
+    """Lookup interface shared by HashRing and the engines in lookup_engines.
+
+    An engine maps request keys to node ids. It has to provide
+    get_node_for_request, _walk (distinct nodes in preference order),
+    get_nodes_for_hashes, add_node, remove_node, set_weight, get_node_slots
+    and get_ring_status. node_weights holds the current members.
+    """
+
+    def __init__(self, hash_function=DEFAULT_HASH_FUNCTION):
+        if hash_function not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash function: {hash_function}")
+        self.hash_function = hash_function
+        self.node_weights = {}  # node -> weight
+
+    def H(self, key):
+        """64-bit hash of a request key"""
+        return HASH_FUNCTIONS[self.hash_function][0](key)
+
+    def H_array(self, request_ids):
+        """Vectorized H over an int64 array of request IDs, as uint64"""
+        scalar_hash, array_hash = HASH_FUNCTIONS[self.hash_function]
+        if array_hash is not None:
+            return array_hash(request_ids)
+        return np.fromiter((scalar_hash(i) for i in request_ids.tolist()), dtype=np.uint64, count=len(request_ids))
+
+    def get_nodes(self):
+        """Get list of active nodes"""
+        return list(self.node_weights)
+
+    def get_nodes_for_requests(self, request_ids):
+        """Get the owning node for every request ID in an array (-1 when there are no nodes)"""
+        return self.get_nodes_for_hashes(self.H_array(np.asarray(request_ids, dtype=np.int64)))
+
+    def add_nodes(self, node_weights):
+        """Add every node in a node -> weight dict, returning the nodes that were rejected.
+
+        Engines that rebuild their whole lookup structure on each change
+        override this to build it once for all of them.
+        """
+        return [node for node, weight in node_weights.items() if not self.add_node(node, weight)]
+
+    def get_preference_list(self, request_id, count):
+        """Get up to `count` distinct nodes in preference order, owner first"""
+        return list(itertools.islice(self._walk(request_id), count))
+
+    def get_bounded_preference_list(self, request_id, count, loads, epsilon):
+        """Preference list starting at the first node whose load is under (1+ε) × average.
+
+        Consistent hashing with bounded loads: `loads` maps node -> current load,
+        and a node at capacity passes the request on to its successor in _walk order.
+        """
+        if not self.node_weights:
+            return []
+
+        total_load = sum(loads.get(node, 0) for node in self.node_weights)
+        capacity = math.ceil((1 + epsilon) * (total_load + 1) / len(self.node_weights))
+
+        nodes = []
+        for node in self._walk(request_id):
+            if nodes or loads.get(node, 0) < capacity:
+                nodes.append(node)
+                if len(nodes) == count:
+                    break
+        return nodes
+
+    def get_load_distribution(self, request_ids):
+        """Analyze load distribution for a list of request IDs"""
+        load_count = {node_id: 0 for node_id in self.node_weights}
+        if not load_count:
+            return load_count
+
+        nodes, counts = np.unique(self.get_nodes_for_requests(request_ids), return_counts=True)
+        for node, count in zip(nodes.tolist(), counts.tolist()):
+            load_count[node] = count
+        return load_count
+
+    def copy(self):
+        """Independent copy; lookup structures are rebuilt rather than changed in place, so they are shared"""
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.node_weights = dict(self.node_weights)
+        return clone
+
+
+class HashRing(Router):
+    def __init__(self, num_nodes=3, ring_size=512, replicas=9, token_bits=None, hash_function=None):
         self.num_nodes = num_nodes
-        self.ring_size = ring_size
         self.replicas = replicas
-        self.ring = [None] * ring_size
+        self.token_bits = token_bits
+        if hash_function is None:
+            hash_function = DEFAULT_HASH_FUNCTION if token_bits else "quadratic"
+        if hash_function != "quadratic" and hash_function not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash function: {hash_function}")
+        if hash_function == "xxhash" and xxhash is None:
+            raise ValueError("hash_function='xxhash' requires the xxhash package")
+        self.hash_function = hash_function
+        if token_bits:
+            # Hashed token space: only occupied tokens are stored, so capacity is unbounded
+            self.ring_size = 2 ** token_bits
+            self.ring = {}
+            self.owner_table = None
+        else:
+            self.ring_size = ring_size
+            self.ring = [None] * ring_size
+            self.owner_table = [None] * ring_size  # slot -> node owning requests that hash there
         self.node_positions = {}  # Track all positions for each node
-        self._setup_ring()
+        self.node_weights = {}  # node -> weight, scaling its share of virtual servers
+        self.sorted_slots = []  # Occupied slots in clockwise order
+        self._lookup_arrays = None  # Cached (positions, owners) arrays for batch lookups
+        if num_nodes > 0:
+            self._setup_ring()
+
+    def _position(self, value):
+        """Reduce a 64-bit hash value to a ring position"""
+        if self.token_bits:
+            return value >> (64 - self.token_bits)
+        return value % self.ring_size
 
     def H(self, i):
-        """Hash function for request mapping: H(i) = i²/2 + 2i + 17"""
-        return (i * i // 2 + 2 * i + 17) % self.ring_size
+        """Hash function for request mapping: H(i) = i²/2 + 2i + 17 unless another hash_function is set"""
+        if self.hash_function == "quadratic":
+            return (i * i // 2 + 2 * i + 17) % self.ring_size
+        return self._position(HASH_FUNCTIONS[self.hash_function][0](i))
+
+    def H_array(self, request_ids):
+        """Vectorized H over an int64 array of request IDs"""
+        if self.hash_function == "quadratic":
+            # i²/2 mod ring_size only depends on i mod 2*ring_size, which keeps i² inside int64
+            i = request_ids % (2 * self.ring_size)
+            return (i * i // 2 + 2 * i + 17) % self.ring_size
+
+        scalar_hash, array_hash = HASH_FUNCTIONS[self.hash_function]
+        if array_hash is not None:
+            values = array_hash(request_ids)
+        else:
+            values = np.fromiter((scalar_hash(i) for i in request_ids.tolist()),
+                                 dtype=np.uint64, count=len(request_ids))
+        if self.token_bits:
+            return values >> np.uint64(64 - self.token_bits)
+        return (values % np.uint64(self.ring_size)).astype(np.int64)
 
     def Phi(self, i, j):
-        """Hash function for virtual server mapping: Φ(i,j) = i² + j² + 2j² + 25"""
-        return (i * i + j * j + 2 * j * j + 25) % self.ring_size
+        """Hash function for virtual server mapping: Φ(i,j) = i² + j² + 2j² + 25 unless another hash_function is set"""
+        if self.hash_function == "quadratic":
+            return (i * i + j * j + 2 * j * j + 25) % self.ring_size
+        return self._position(HASH_FUNCTIONS[self.hash_function][0](f"{i}:{j}"))
+
+    def _place_virtual_server(self, node_id, replica_id):
+        """Place one virtual server, returning its slot or None if the ring is full"""
+        slot = self.Phi(node_id, replica_id)
+        original_slot = slot
+
+        if self.token_bits:
+            # Token collisions are vanishingly rare; step past one if it happens
+            while slot in self.ring:
+                slot = (slot + 1) % self.ring_size
+        else:
+            # Linear probing to handle collisions
+            while self.ring[slot] is not None:
+                slot = (slot + 1) % self.ring_size
+                if slot == original_slot:
+                    return None
+
+        self._occupy(node_id, slot)
+        return slot
+
+    def _occupy(self, node_id, slot):
+        """Give a free slot to a node"""
+        self.ring[slot] = node_id
+        self.node_positions[node_id].append(slot)
+        self._lookup_arrays = None
+        bisect.insort(self.sorted_slots, slot)
+        if not self.token_bits:
+            self._fill_owner_range(slot)
+
+    def _fill_owner_range(self, slot):
+        """Point every slot after the previous occupied slot, up to `slot`, at its owner"""
+        owner = self.ring[slot]
+        self.owner_table[slot] = owner
+        current_slot = (slot - 1) % self.ring_size
+        while self.ring[current_slot] is None and current_slot != slot:
+            self.owner_table[current_slot] = owner
+            current_slot = (current_slot - 1) % self.ring_size
 
     def _setup_ring(self):
         """Set up the hash ring with virtual servers"""
         self.node_positions = {i: [] for i in range(self.num_nodes)}
-        
+        self.node_weights = {i: 1.0 for i in range(self.num_nodes)}
+
         for node_id in range(self.num_nodes):
             for replica_id in range(self.replicas):
-                slot = self.Phi(node_id, replica_id)
-                original_slot = slot
-                
-                # Linear probing to handle collisions
-                while self.ring[slot] is not None:
-                    slot = (slot + 1) % self.ring_size
-                    if slot == original_slot:
-                        raise Exception("Hash ring is full - cannot place all virtual servers")
-                
-                self.ring[slot] = node_id
-                self.node_positions[node_id].append(slot)
+                if self._place_virtual_server(node_id, replica_id) is None:
+                    raise Exception("Hash ring is full - cannot place all virtual servers")
 
     def get_node_for_request(self, request_id):
         """Get the node that should handle this request using clockwise assignment"""
-        slot = self.H(request_id)
-        
-        # Find the next node in clockwise direction (including the current slot)
-        for i in range(self.ring_size):
-            current_slot = (slot + i) % self.ring_size
-            if self.ring[current_slot] is not None:
-                return self.ring[current_slot]
-        
-        return None  # No nodes available
-
-    def add_node(self, node_id):
-        """Add a new node to the hash ring"""
+        if not self.token_bits:
+            return self.owner_table[self.H(request_id)]
+        if not self.sorted_slots:
+            return None
+
+        # First occupied token at or after the request token, wrapping past the end
+        index = bisect.bisect_left(self.sorted_slots, self.H(request_id))
+        if index == len(self.sorted_slots):
+            index = 0
+        return self.ring[self.sorted_slots[index]]
+
+    def _walk(self, request_id):
+        """Yield each distinct node once, in clockwise order from the request's position"""
+        index = bisect.bisect_left(self.sorted_slots, self.H(request_id))
+        seen = set()
+        for i in range(len(self.sorted_slots)):
+            node = self.ring[self.sorted_slots[(index + i) % len(self.sorted_slots)]]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.node_positions):
+                    return
+
+    def get_nodes_for_requests(self, request_ids):
+        """Get the owning node for every request ID in an array (-1 when the ring is empty)"""
+        request_ids = np.asarray(request_ids, dtype=np.int64)
+        if not self.sorted_slots:
+            return np.full(request_ids.shape, -1, dtype=np.int64)
+        return self._owners_at(self.H_array(request_ids))
+
+    def get_nodes_for_hashes(self, key_hashes):
+        """Get the owning node for every precomputed 64-bit key hash in a uint64 array (-1 when the ring is empty)"""
+        if self.hash_function == "quadratic":
+            raise ValueError("The quadratic hash function has no 64-bit key hashes")
+        if not self.sorted_slots:
+            return np.full(key_hashes.shape, -1, dtype=np.int64)
+        if self.token_bits:
+            return self._owners_at(key_hashes >> np.uint64(64 - self.token_bits))
+        return self._owners_at((key_hashes % np.uint64(self.ring_size)).astype(np.int64))
+
+    def _owners_at(self, slots):
+        """Owner of every ring position in an array"""
+        if self._lookup_arrays is None:
+            positions = np.array(self.sorted_slots, dtype=np.uint64 if self.token_bits else np.int64)
+            owners = np.array([self.ring[slot] for slot in self.sorted_slots], dtype=np.int64)
+            self._lookup_arrays = (positions, owners)
+        positions, owners = self._lookup_arrays
+
+        # Clockwise successor of every request slot, wrapping past the last position
+        indices = np.searchsorted(positions, slots, side="left")
+        indices[indices == len(positions)] = 0
+        return owners[indices]
+
+    def _replica_count(self, weight):
+        """Virtual servers for a node of the given weight (at least one)"""
+        return max(1, round(self.replicas * weight))
+
+    def add_node(self, node_id, weight=1.0):
+        """Add a new node to the hash ring with replicas × weight virtual servers"""
         if node_id in self.node_positions:
             return False  # Node already exists
-        
+
         self.node_positions[node_id] = []
-        for replica_id in range(self.replicas):
-            slot = self.Phi(node_id, replica_id)
-            original_slot = slot
-            
-            while self.ring[slot] is not None:
-                slot = (slot + 1) % self.ring_size
-                if slot == original_slot:
-                    return False  # Cannot add node
-            
-            self.ring[slot] = node_id
-            self.node_positions[node_id].append(slot)
-        
+        for replica_id in range(self._replica_count(weight)):
+            if self._place_virtual_server(node_id, replica_id) is None:
+                self._clear_node(node_id)
+                return False  # Cannot add node
+
+        self.node_weights[node_id] = weight
+        self.num_nodes += 1
+        return True
+
+    def add_node_at(self, node_id, weight, positions):
+        """Add a node on exactly the given slots, e.g. ones saved by an earlier process"""
+        if node_id in self.node_positions:
+            return False
+        occupied = (lambda slot: slot in self.ring) if self.token_bits else (lambda slot: self.ring[slot] is not None)
+        if not positions or len(set(positions)) < len(positions) or any(occupied(slot) for slot in positions):
+            return False  # Slots taken by another node: the caller should fall back to add_node
+
+        self.node_positions[node_id] = []
+        for slot in positions:
+            self._occupy(node_id, slot)
+        self.node_weights[node_id] = weight
         self.num_nodes += 1
         return True
 
+    def set_weight(self, node_id, weight):
+        """Change a node's weight, adding or dropping only its highest-numbered virtual servers"""
+        if node_id not in self.node_positions:
+            return False
+
+        positions = self.node_positions[node_id]
+        target = self._replica_count(weight)
+        if target < len(positions):
+            freed_slots = positions[target:]
+            del positions[target:]
+            self._free_slots(freed_slots)
+        else:
+            current = len(positions)
+            for replica_id in range(current, target):
+                if self._place_virtual_server(node_id, replica_id) is None:
+                    freed_slots = positions[current:]
+                    del positions[current:]
+                    self._free_slots(freed_slots)
+                    return False  # Ring is full, weight unchanged
+
+        self.node_weights[node_id] = weight
+        return True
+
+    def _clear_node(self, node_id):
+        """Free every slot held by a node and drop it from the ring"""
+        self.node_weights.pop(node_id, None)
+        self._free_slots(self.node_positions.pop(node_id))
+
+    def _free_slots(self, freed_slots):
+        """Empty the given slots and hand their ranges to the next occupied slot clockwise"""
+        for slot in freed_slots:
+            if self.token_bits:
+                del self.ring[slot]
+            else:
+                self.ring[slot] = None
+
+        self._lookup_arrays = None
+        freed = set(freed_slots)
+        self.sorted_slots = [slot for slot in self.sorted_slots if slot not in freed]
+        if self.token_bits:
+            return
+        if not self.sorted_slots:
+            self.owner_table = [None] * self.ring_size
+            return
+
+        successors = set()
+        for slot in freed_slots:
+            index = bisect.bisect_left(self.sorted_slots, slot) % len(self.sorted_slots)
+            successors.add(self.sorted_slots[index])
+        for slot in successors:
+            self._fill_owner_range(slot)
+
     def remove_node(self, node_id):
         """Remove a node from the hash ring"""
         if node_id not in self.node_positions:
             return False
-        
+
         # Remove all virtual servers for this node
-        for slot in self.node_positions[node_id]:
-            self.ring[slot] = None
-        
-        del self.node_positions[node_id]
+        self._clear_node(node_id)
         self.num_nodes -= 1
         return True
 
+    def get_node_slots(self):
+        """Virtual servers on the ring for each node"""
+        return {node: len(positions) for node, positions in self.node_positions.items()}
+
     def get_ring_status(self):
         """Get current status of the ring"""
-        occupied_slots = sum(1 for slot in self.ring if slot is not None)
         return {
             "total_slots": self.ring_size,
-            "occupied_slots": occupied_slots,
+            "occupied_slots": len(self.sorted_slots),
             "nodes": list(self.node_positions.keys()),
-            "virtual_servers_per_node": self.replicas
+            "virtual_servers_per_node": self.replicas,
+            "node_weights": dict(self.node_weights),
+            "token_bits": self.token_bits,
+            "hash_function": self.hash_function
         }
 
-    def get_load_distribution(self, request_ids):
-        """Analyze load distribution for a list of request IDs"""
-        load_count = {node_id: 0 for node_id in self.node_positions.keys()}
-        
-        for req_id in request_ids:
-            node = self.get_node_for_request(req_id)
-            if node is not None:
-                load_count[node] += 1
-        
-        return load_count
+    def copy(self):
+        """Independent copy of the ring, for building a new version without touching this one"""
+        clone = HashRing.__new__(HashRing)
+        clone.__dict__.update(self.__dict__)
+        clone.ring = self.ring.copy()
+        clone.owner_table = self.owner_table.copy() if self.owner_table is not None else None
+        clone.node_positions = {node: positions.copy() for node, positions in self.node_positions.items()}
+        clone.node_weights = self.node_weights.copy()
+        clone.sorted_slots = self.sorted_slots.copy()
+        return clone
 
-    def get_nodes(self):
-        """Get list of active nodes"""
-        return list(self.node_positions.keys())
-    
     def visualize_ring(self, sample_size=20):
         """Visualize a sample of the ring for debugging"""
         print(f"Ring visualization (showing first {sample_size} slots):")
+        if self.token_bits:
+            for token in self.sorted_slots[:sample_size]:
+                print(f"Token {token:#018x}: {self.ring[token]}")
+            return
         for i in range(min(sample_size, self.ring_size)):
             node = self.ring[i] if self.ring[i] is not None else "Empty"
             print(f"Slot {i:3d}: {node}")
\ No newline at end of file
@@ -0,0 +1,261 @@
+import math
+
+import numpy as np
+
+from consistent_hash import DEFAULT_HASH_FUNCTION, HashRing, Router, splitmix64_array, splitmix64_hash
+
+
+def _is_prime(n):
+    return n > 1 and all(n % d for d in range(2, math.isqrt(n) + 1))
+
+
+class MaglevTable(Router):
+    """Maglev consistent hashing: a prime-sized table where each key's entry names its node.
+
+    Every node walks its own permutation of the table and claims free entries
+    in turn, so lookups are one index and nodes end up with near-equal shares
+    (weighted nodes take proportionally more turns). The whole table is rebuilt
+    on every membership change.
+    """
+
+    def __init__(self, table_size=65537, hash_function=DEFAULT_HASH_FUNCTION):
+        super().__init__(hash_function)
+        if not _is_prime(table_size):
+            raise ValueError(f"Maglev table size must be prime: {table_size}")
+        self.table_size = table_size
+        self.table = np.full(table_size, -1, dtype=np.int64)
+        self.entries = self.table.tolist()  # Python list copy for fast scalar lookups
+
+    def _permutation(self, node_id):
+        """(offset, skip) of a node's walk through the table"""
+        value = self.H(f"maglev:{node_id}")
+        return value % self.table_size, (value >> 32) % (self.table_size - 1) + 1
+
+    def _build(self):
+        """Refill the whole table from the current nodes and weights"""
+        size = self.table_size
+        entries = [-1] * size
+        nodes = sorted(self.node_weights)  # Same table whatever order nodes were added in
+        if nodes:
+            permutations = [self._permutation(node) for node in nodes]
+            positions = [offset for offset, _ in permutations]
+            skips = [skip for _, skip in permutations]
+            max_weight = max(self.node_weights.values())
+            turns = [self.node_weights[node] / max_weight for node in nodes]
+            credits = [0.0] * len(nodes)
+            filled = 0
+            while filled < size:
+                for i, node in enumerate(nodes):
+                    credits[i] += turns[i]
+                    while credits[i] >= 1 and filled < size:
+                        credits[i] -= 1
+                        position = positions[i]
+                        while entries[position] != -1:
+                            position = (position + skips[i]) % size
+                        entries[position] = node
+                        positions[i] = (position + skips[i]) % size
+                        filled += 1
+        self.entries = entries
+        self.table = np.array(entries, dtype=np.int64)
+
+    def get_node_for_request(self, request_id):
+        """Get the node that should handle this request (None when there are no nodes)"""
+        node = self.entries[self.H(request_id) % self.table_size]
+        return None if node == -1 else node
+
+    def _walk(self, request_id):
+        """Yield each distinct node once, reading the table onwards from the request's entry"""
+        if not self.node_weights:
+            return
+        index = self.H(request_id) % self.table_size
+        seen = set()
+        for i in range(self.table_size):
+            node = self.entries[(index + i) % self.table_size]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.node_weights):
+                    return
+
+    def get_nodes_for_hashes(self, key_hashes):
+        """Get the owning node for every precomputed 64-bit key hash in a uint64 array (-1 when there are no nodes)"""
+        return self.table[(key_hashes % np.uint64(self.table_size)).astype(np.int64)]
+
+    def add_node(self, node_id, weight=1.0):
+        """Add a node and rebuild the table"""
+        if node_id in self.node_weights:
+            return False
+        self.node_weights[node_id] = weight
+        self._build()
+        return True
+
+    def add_nodes(self, node_weights):
+        """Add many nodes and rebuild the table once, returning the ones already present"""
+        rejected = [node for node in node_weights if node in self.node_weights]
+        added = {node: weight for node, weight in node_weights.items() if node not in self.node_weights}
+        if added:
+            self.node_weights.update(added)
+            self._build()
+        return rejected
+
+    def set_weight(self, node_id, weight):
+        """Change a node's share of table entries"""
+        if node_id not in self.node_weights:
+            return False
+        self.node_weights[node_id] = weight
+        self._build()
+        return True
+
+    def remove_node(self, node_id):
+        """Remove a node and rebuild the table"""
+        if node_id not in self.node_weights:
+            return False
+        del self.node_weights[node_id]
+        self._build()
+        return True
+
+    def get_node_slots(self):
+        """Table entries owned by each node"""
+        nodes, counts = np.unique(self.table[self.table >= 0], return_counts=True)
+        return dict(zip(nodes.tolist(), counts.tolist()))
+
+    def get_ring_status(self):
+        """Get current status of the table"""
+        return {
+            "engine": "maglev",
+            "total_slots": self.table_size,
+            "occupied_slots": self.table_size if self.node_weights else 0,
+            "nodes": self.get_nodes(),
+            "node_weights": dict(self.node_weights),
+            "hash_function": self.hash_function
+        }
+
+
+class RendezvousHash(Router):
+    """Weighted rendezvous (highest random weight) hashing.
+
+    Each node scores a key as weight / -ln(u), with u a uniform hash of the
+    (key, node) pair, and the highest score wins. There are no virtual servers
+    or tables: a membership change only moves the keys whose winner came or
+    went, at the cost of scoring every node on each lookup.
+    """
+
+    NUMPY_MIN_NODES = 16  # Below this, scoring in plain Python beats numpy's per-call overhead
+
+    def __init__(self, hash_function=DEFAULT_HASH_FUNCTION):
+        super().__init__(hash_function)
+        self.seeds = {}  # node -> 64-bit seed mixed into each key hash
+        self._rebuild_arrays()
+
+    def _rebuild_arrays(self):
+        """Node, seed and weight arrays for scoring; replaced, never changed in place"""
+        nodes = list(self.node_weights)
+        self.node_array = np.array(nodes, dtype=np.int64)
+        self.seed_array = np.array([self.seeds[node] for node in nodes], dtype=np.uint64)
+        self.weight_array = np.array([self.node_weights[node] for node in nodes], dtype=np.float64)
+
+    def _scores(self, key_hashes):
+        """Score matrix of shape (nodes, keys) for a uint64 array of key hashes"""
+        mixed = splitmix64_array(key_hashes[np.newaxis, :] ^ self.seed_array[:, np.newaxis])
+        uniform = ((mixed >> np.uint64(11)).astype(np.float64) + 0.5) / 2 ** 53
+        return self.weight_array[:, np.newaxis] / -np.log(uniform)
+
+    def _score(self, key_hash, node):
+        """Scalar version of _scores for one node, matching it bit for bit"""
+        mixed = splitmix64_hash(key_hash ^ self.seeds[node])
+        return self.node_weights[node] / -math.log(((mixed >> 11) + 0.5) / 2 ** 53)
+
+    def _ranked(self, request_id):
+        """All nodes, highest score first"""
+        key_hash = self.H(request_id)
+        if len(self.node_weights) < self.NUMPY_MIN_NODES:
+            return sorted(self.node_weights, key=lambda node: self._score(key_hash, node), reverse=True)
+        scores = self._scores(np.array([key_hash], dtype=np.uint64))[:, 0]
+        return self.node_array[np.argsort(-scores, kind="stable")].tolist()
+
+    def get_node_for_request(self, request_id):
+        """Get the node with the highest score for this request (None when there are no nodes)"""
+        if not self.node_weights:
+            return None
+        key_hash = self.H(request_id)
+        if len(self.node_weights) < self.NUMPY_MIN_NODES:
+            return max(self.node_weights, key=lambda node: self._score(key_hash, node))
+        return int(self.node_array[self._scores(np.array([key_hash], dtype=np.uint64))[:, 0].argmax()])
+
+    def _walk(self, request_id):
+        """Yield every node, highest score first"""
+        yield from self._ranked(request_id)
+
+    def get_nodes_for_hashes(self, key_hashes, chunk_size=1 << 18):
+        """Get the owning node for every precomputed 64-bit key hash in a uint64 array (-1 when there are no nodes)"""
+        if not self.node_weights:
+            return np.full(key_hashes.shape, -1, dtype=np.int64)
+        # Chunked so the (nodes, keys) score matrix stays small for long key arrays
+        owners = np.empty(key_hashes.shape, dtype=np.int64)
+        for start in range(0, len(key_hashes), chunk_size):
+            chunk = key_hashes[start:start + chunk_size]
+            owners[start:start + chunk_size] = self.node_array[self._scores(chunk).argmax(axis=0)]
+        return owners
+
+    def add_node(self, node_id, weight=1.0):
+        """Add a node; nothing else needs rebuilding"""
+        if node_id in self.node_weights:
+            return False
+        self.node_weights[node_id] = weight
+        self.seeds = dict(self.seeds)
+        self.seeds[node_id] = self.H(f"rendezvous:{node_id}")
+        self._rebuild_arrays()
+        return True
+
+    def add_nodes(self, node_weights):
+        """Add many nodes and rebuild the scoring arrays once, returning the ones already present"""
+        rejected = [node for node in node_weights if node in self.node_weights]
+        added = {node: weight for node, weight in node_weights.items() if node not in self.node_weights}
+        if added:
+            self.node_weights.update(added)
+            self.seeds = dict(self.seeds)
+            for node_id in added:
+                self.seeds[node_id] = self.H(f"rendezvous:{node_id}")
+            self._rebuild_arrays()
+        return rejected
+
+    def set_weight(self, node_id, weight):
+        """Change a node's weight, moving keys only to or from that node"""
+        if node_id not in self.node_weights:
+            return False
+        self.node_weights[node_id] = weight
+        self._rebuild_arrays()
+        return True
+
+    def remove_node(self, node_id):
+        """Remove a node; only the keys it won move"""
+        if node_id not in self.node_weights:
+            return False
+        del self.node_weights[node_id]
+        self.seeds = {node: seed for node, seed in self.seeds.items() if node != node_id}
+        self._rebuild_arrays()
+        return True
+
+    def get_node_slots(self):
+        """Rendezvous hashing has no slots"""
+        return {}
+
+    def get_ring_status(self):
+        """Get current status of the node set"""
+        return {
+            "engine": "rendezvous",
+            "total_slots": 0,
+            "occupied_slots": 0,
+            "nodes": self.get_nodes(),
+            "node_weights": dict(self.node_weights),
+            "hash_function": self.hash_function
+        }
+
+
+# Name -> factory for an empty engine, as used by the load balancer's LOOKUP_ENGINE
+ENGINES = {
+    # 64-bit token space so the ring never runs out of room for virtual servers
+    "ring": lambda: HashRing(num_nodes=0, replicas=100, token_bits=64),
+    "maglev": MaglevTable,
+    "rendezvous": RendezvousHash,
+}
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 from consistent_hash import HashRing
+from lookup_engines import ENGINES, MaglevTable, Router
 import random
+import threading
 
 def test_hash_functions():
     """Test the hash functions with sample values"""
@@ -82,6 +84,211 @@ def test_node_operations():
     print(f"Remove successful: {success}")
     print(f"Nodes: {list(hr.node_positions.keys())}")
 
+def test_lookup_after_churn():
+    """Test that owner-table lookups match a clockwise walk after adds and removes"""
+    print("\n=== Testing Lookup After Churn ===")
+    hr = HashRing(num_nodes=3)
+    hr.add_node(3)
+    hr.remove_node(1)
+    hr.add_node(4)
+    hr.remove_node(0)
+
+    for req_id in range(0, 100000, 97):
+        slot = hr.H(req_id)
+        expected = None
+        for i in range(hr.ring_size):
+            expected = hr.ring[(slot + i) % hr.ring_size]
+            if expected is not None:
+                break
+        assert hr.get_node_for_request(req_id) == expected
+    print(f"Nodes: {hr.get_nodes()}, occupied slots: {len(hr.sorted_slots)}")
+
+def test_batch_routing():
+    """Test that batch routing agrees with per-request routing"""
+    print("\n=== Testing Batch Routing ===")
+    hr = HashRing()
+    request_ids = [random.randint(100000, 999999) for _ in range(10000)]
+
+    owners = hr.get_nodes_for_requests(request_ids)
+    assert owners.tolist() == [hr.get_node_for_request(req_id) for req_id in request_ids]
+    print(f"Batch owners for first 5 requests: {owners[:5].tolist()}")
+
+def test_token_ring_capacity():
+    """Test that a token-space ring accepts more virtual servers than a slot ring holds"""
+    print("\n=== Testing Token Ring Capacity ===")
+    hr = HashRing(num_nodes=0, replicas=100, token_bits=64)
+
+    for node_id in range(20):
+        assert hr.add_node(node_id)
+    assert hr.get_ring_status()["occupied_slots"] == 2000
+
+    request_ids = [random.randint(100000, 999999) for _ in range(1000)]
+    owners = hr.get_nodes_for_requests(request_ids)
+    assert owners.tolist() == [hr.get_node_for_request(req_id) for req_id in request_ids]
+
+    hr.remove_node(7)
+    assert 7 not in hr.get_load_distribution(request_ids)
+    print(f"Nodes: {len(hr.get_nodes())}, virtual servers: {len(hr.sorted_slots)}")
+
+def test_pluggable_hash_functions():
+    """Test that every hash function routes batches and single requests the same way"""
+    print("\n=== Testing Pluggable Hash Functions ===")
+    request_ids = [random.randint(100000, 999999) for _ in range(2000)]
+
+    for hash_function in ["quadratic", "blake2b", "blake2b+splitmix64", "fnv1a", "splitmix64"]:
+        hr = HashRing(num_nodes=3, ring_size=512, replicas=9, hash_function=hash_function)
+        owners = hr.get_nodes_for_requests(request_ids)
+        assert owners.tolist() == [hr.get_node_for_request(req_id) for req_id in request_ids]
+        print(f"{hash_function}: {hr.get_load_distribution(request_ids)}")
+
+def test_preference_list():
+    """Test that preference lists start at the owner and hold distinct nodes"""
+    print("\n=== Testing Preference List ===")
+    for hr in [HashRing(num_nodes=5), HashRing(num_nodes=5, replicas=100, token_bits=64)]:
+        for req_id in [123456, 789012, 345678]:
+            preference = hr.get_preference_list(req_id, 3)
+            assert preference[0] == hr.get_node_for_request(req_id)
+            assert len(set(preference)) == 3
+            print(f"Request {req_id} -> {preference}")
+        assert sorted(hr.get_preference_list(123456, 10)) == [0, 1, 2, 3, 4]
+
+def test_bounded_loads():
+    """Test that an overloaded owner passes the request to its clockwise successor"""
+    print("\n=== Testing Bounded Loads ===")
+    hr = HashRing(num_nodes=4, replicas=100, token_bits=64)
+    req_id = 123456
+    owner, successor = hr.get_preference_list(req_id, 2)
+
+    assert hr.get_bounded_preference_list(req_id, 2, {}, 0.25) == [owner, successor]
+    loads = {owner: 10, successor: 0}
+    assert hr.get_bounded_preference_list(req_id, 1, loads, 0.25) == [successor]
+    print(f"Owner {owner} at load 10 -> request goes to {successor}")
+
+def test_weighted_nodes():
+    """Test that vnode counts follow weights and reweighting only moves the changed vnodes"""
+    print("\n=== Testing Weighted Nodes ===")
+    hr = HashRing(num_nodes=0, replicas=100, token_bits=64)
+    hr.add_node(0)
+    hr.add_node(1, weight=2.0)
+    assert len(hr.node_positions[0]) == 100 and len(hr.node_positions[1]) == 200
+
+    request_ids = list(range(100000, 120000))
+    before = hr.get_nodes_for_requests(request_ids)
+    kept_positions = list(hr.node_positions[1][:50])
+    assert hr.set_weight(1, 0.5)
+    assert hr.node_positions[1] == kept_positions
+    after = hr.get_nodes_for_requests(request_ids)
+
+    # Only keys that belonged to node 1's dropped vnodes may move, and only to node 0
+    moved = before != after
+    assert (before[moved] == 1).all() and (after[moved] == 0).all()
+    print(f"Reweighting 2.0 -> 0.5 moved {moved.mean() * 100:.1f}% of keys")
+
+def test_copy_on_write_churn():
+    """Test that readers of published ring copies never see a half-updated ring during churn"""
+    print("\n=== Testing Copy-on-Write Churn ===")
+    published = [HashRing(num_nodes=4, replicas=50, token_bits=64)]
+    stop = threading.Event()
+    errors = []
+    request_ids = list(range(1000))
+
+    def writer():
+        node_id = 4
+        for i in range(200):
+            draft = published[0].copy()
+            nodes = draft.get_nodes()
+            if len(nodes) > 2 and i % 2:
+                draft.remove_node(random.choice(nodes))
+            else:
+                draft.add_node(node_id, weight=random.choice([0.5, 1.0, 2.0]))
+                node_id += 1
+            published[0] = draft
+        stop.set()
+
+    def reader():
+        while not stop.is_set():
+            ring = published[0]
+            members = set(ring.get_nodes())
+            try:
+                first = [ring.get_node_for_request(req_id) for req_id in request_ids]
+                assert set(first) <= members
+                assert ring.get_nodes_for_requests(request_ids).tolist() == first
+                assert [ring.get_node_for_request(req_id) for req_id in request_ids] == first
+                assert all(len(ring.get_preference_list(req_id, 2)) == 2 for req_id in request_ids[:50])
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+    threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    print(f"200 membership changes under 4 reader threads, final nodes: {published[0].get_nodes()}")
+
+def test_restore_positions():
+    """Test that a ring rebuilt from saved positions routes exactly like the original"""
+    print("\n=== Testing Restore From Saved Positions ===")
+    hr = HashRing(num_nodes=3, replicas=50, token_bits=64)
+    hr.add_node(3, weight=2.0)
+    hr.remove_node(1)
+    saved = {node: list(positions) for node, positions in hr.node_positions.items()}
+
+    restored = HashRing(num_nodes=0, replicas=50, token_bits=64)
+    for node in reversed(list(saved)):
+        assert restored.add_node_at(node, hr.node_weights[node], saved[node])
+    assert restored.node_weights == hr.node_weights
+    request_ids = list(range(5000))
+    assert restored.get_nodes_for_requests(request_ids).tolist() == hr.get_nodes_for_requests(request_ids).tolist()
+    assert [restored.get_node_for_request(i) for i in request_ids[:500]] == \
+        [hr.get_node_for_request(i) for i in request_ids[:500]]
+
+    # Taken or repeated slots are refused without changing the ring
+    assert not restored.add_node_at(9, 1.0, saved[0][:1])
+    assert not restored.add_node_at(9, 1.0, [1, 1])
+    assert 9 not in restored.get_nodes()
+    print(f"Restored nodes {restored.get_nodes()} with identical routing for {len(request_ids)} requests")
+
+def test_lookup_engines():
+    """Test that every engine agrees between scalar and batch lookups and moves few keys on removal"""
+    print("\n=== Testing Lookup Engines ===")
+    request_ids = list(range(100000, 120000))
+    for name, create in ENGINES.items():
+        engine = create()
+        assert isinstance(engine, Router)
+        for node_id in range(5):
+            engine.add_node(node_id, weight=2.0 if node_id == 0 else 1.0)
+
+        owners = engine.get_nodes_for_requests(request_ids)
+        assert owners[:500].tolist() == [engine.get_node_for_request(req_id) for req_id in request_ids[:500]]
+        assert all(engine.get_preference_list(req_id, 2)[0] == engine.get_node_for_request(req_id)
+                   for req_id in request_ids[:100])
+        assert sorted(engine.get_preference_list(123456, 10)) == [0, 1, 2, 3, 4]
+
+        # Adding the same nodes in one bulk load builds the same lookup structure
+        bulk = create()
+        assert bulk.add_nodes({node_id: 2.0 if node_id == 0 else 1.0 for node_id in reversed(range(5))}) == []
+        assert bulk.add_nodes({4: 1.0}) == [4]
+        assert (bulk.get_nodes_for_requests(request_ids) == owners).all()
+
+        # Only the removed node's keys move (Maglev may shuffle a few more), and the copy leaves the original untouched
+        smaller = engine.copy()
+        smaller.remove_node(4)
+        after = smaller.get_nodes_for_requests(request_ids)
+        moved = owners != after
+        assert (owners[moved] != 4).mean() < (0.01 if name == "maglev" else 1e-9)
+        assert (engine.get_nodes_for_requests(request_ids) == owners).all()
+
+        share = (owners == 0).mean()
+        print(f"{name}: weight-2 node share {share * 100:.1f}%, {moved.mean() * 100:.1f}% of keys moved")
+        assert 0.25 < share < 0.42
+
+    table = MaglevTable(table_size=5)
+    assert table.get_node_for_request(1) is None
+    table.add_node(7)
+    assert table.get_node_slots() == {7: 5}
+
 if __name__ == "__main__":
     print("Consistent Hashing Implementation Test")
     print("=" * 50)
@@ -91,6 +298,16 @@ if __name__ == "__main__":
     test_request_routing()
     test_load_distribution()
     test_node_operations()
+    test_lookup_after_churn()
+    test_batch_routing()
+    test_token_ring_capacity()
+    test_pluggable_hash_functions()
+    test_preference_list()
+    test_bounded_loads()
+    test_weighted_nodes()
+    test_copy_on_write_churn()
+    test_restore_positions()
+    test_lookup_engines()
     
     print("\n" + "=" * 50)
     print("Testing completed!")
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""Asyncio data plane for the load balancer.
+
+Serves the same /rep, /add, /rm and /<path> API as load_balancer.py, but
+proxies on an event loop with non-blocking aiohttp upstream calls, so a slow
+backend only holds a coroutine instead of a server thread. Membership changes
+still go through the shared LoadBalancer and wait in a worker thread for the
+provisioning pool to finish. Run with `python async_proxy.py`.
+"""
+import asyncio
+import functools
+import json
+import os
+import time
+
+import aiohttp
+from aiohttp import web
+
+from load_balancer import (IDLE_TIMEOUT, MAX_CONNECTIONS_PER_BACKEND, PORT, ROUTE_BUDGET, SINGLE_FLIGHT,
+                           UPSTREAM_TIMEOUT, RoutingError, lb)
+from single_flight import AsyncSingleFlight
+from structured_log import log
+
+MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "10000"))
+
+
+async def get_replicas(request):
+    return web.json_response(lb.replica_status())
+
+
+async def get_metrics(request):
+    body, content_type = lb.metrics_text()
+    return web.Response(text=body, headers={'Content-Type': content_type})
+
+
+async def add_servers(request):
+    data = await request.json()
+    loop = asyncio.get_running_loop()
+    body, status = await loop.run_in_executor(
+        None, functools.partial(lb.add_servers, data.get('n', 0), data.get('hostnames', []),
+                                data.get('weights'), wait=not data.get('async', False)))
+    return web.json_response(body, status=status)
+
+
+async def set_weights(request):
+    data = await request.json()
+    loop = asyncio.get_running_loop()
+    # Waits on the membership lock (and the ring snapshot fsync), so it must not block the event loop
+    body, status = await loop.run_in_executor(None, functools.partial(lb.set_weights, data.get('weights', {})))
+    return web.json_response(body, status=status)
+
+
+async def remove_servers(request):
+    data = await request.json()
+    loop = asyncio.get_running_loop()
+    body, status = await loop.run_in_executor(
+        None, functools.partial(lb.remove_servers, data.get('n', 0), data.get('hostnames', []),
+                                wait=not data.get('async', False)))
+    return web.json_response(body, status=status)
+
+
+async def get_job(request):
+    body, status = lb.job_status(request.match_info['job_id'])
+    return web.json_response(body, status=status)
+
+
+async def forward(client, path, hostnames, start, request_key):
+    """Send a GET upstream with failover, returning (body, status, hostname, attempts)."""
+    # GETs are idempotent, so a failed attempt moves on to the next node clockwise
+    deadline = start + ROUTE_BUDGET
+    error = "route budget exhausted"
+    attempts = 0
+    for attempt, hostname in enumerate(hostnames):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        attempts += 1
+        if attempt:
+            log.warn("Failing over", hostname=hostname, attempt=attempt + 1)
+        try:
+            timeout = aiohttp.ClientTimeout(total=min(UPSTREAM_TIMEOUT, remaining))
+            with lb.track_request(hostname):
+                async with client.get(f'{lb.server_url(hostname)}/{path}', timeout=timeout) as response:
+                    lb.metrics.inc("lb_upstream_responses_total", backend=hostname, code=response.status)
+                    if response.status < 500:
+                        body = await response.read()
+                        lb.cache_response(request_key, hostname, body, response.status,
+                                          response.headers.get('Cache-Control'))
+                        return body, response.status, hostname, attempts
+                    error = f"HTTP {response.status}"
+            lb.metrics.inc("lb_upstream_errors_total", backend=hostname, reason="http_5xx")
+        except Exception as e:
+            error = repr(e)
+            reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "connection"
+            lb.metrics.inc("lb_upstream_errors_total", backend=hostname, reason=reason)
+        log.error("Could not reach server", hostname=hostname, error=error)
+
+    return json.dumps({
+        "message": f"<Error> Failed to route to {hostname}: {error}",
+        "status": "failure"
+    }).encode(), 500, hostname, attempts
+
+
+async def route_request(request):
+    path = request.match_info['path']
+    start = time.monotonic()
+    try:
+        hostnames, request_key = lb.select_servers(
+            request.headers, request.cookies, request.query, path, request.remote)
+    except RoutingError as e:
+        lb.log_access(path, e.status, None, 0, start, request.remote)
+        return web.json_response(e.body, status=e.status)
+
+    cached = lb.cached_response(request_key)
+    if cached is not None:
+        body, status = cached
+        lb.log_access(path, status, None, 0, start, request.remote)
+        return web.Response(body=body, status=status, content_type='application/json')
+
+    single_flight = request.app.get('single_flight')
+    call = functools.partial(forward, request.app['client'], path, hostnames, start, request_key)
+    if single_flight is not None and request_key is not None:
+        # Identical concurrent GETs wait for the first one's upstream call instead of repeating it
+        (body, status, hostname, attempts), shared = await single_flight.do(request_key, call)
+        lb.metrics.inc("lb_single_flight_requests_total", role="follower" if shared else "leader")
+    else:
+        body, status, hostname, attempts = await call()
+
+    lb.log_access(path, status, hostname, attempts, start, request.remote)
+    return web.Response(body=body, status=status, content_type='application/json')
+
+
+async def _client_session(app):
+    """Share one upstream session (and its connection pool) across all requests."""
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_BACKEND,
+                                     keepalive_timeout=IDLE_TIMEOUT)
+    timeout = aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT)
+    app['client'] = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    yield
+    await app['client'].close()
+
+
+def create_app():
+    app = web.Application()
+    app.cleanup_ctx.append(_client_session)
+    if SINGLE_FLIGHT:
+        app['single_flight'] = AsyncSingleFlight()
+    app.router.add_get('/rep', get_replicas)
+    app.router.add_get('/metrics', get_metrics)
+    app.router.add_post('/add', add_servers)
+    app.router.add_delete('/rm', remove_servers)
+    app.router.add_put('/weight', set_weights)
+    app.router.add_get('/jobs/{job_id}', get_job)
+    app.router.add_get('/{path:.+}', route_request)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host='0.0.0.0', port=PORT, backlog=4096)
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectTimeout
+from urllib3 import HTTPConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+
+class _BoundedWaitPool(HTTPConnectionPool):
+    """Connection pool that waits for a free connection no longer than the request's connect timeout.
+
+    requests never passes urllib3 a pool_timeout, so with pool_block=True a
+    request to a backend that already has max_connections in flight would
+    otherwise wait forever, whatever its own timeout.
+    """
+
+    def urlopen(self, method, url, *args, **kwargs):
+        if kwargs.get("pool_timeout") is None:
+            connect_timeout = getattr(kwargs.get("timeout"), "connect_timeout", None)
+            if isinstance(connect_timeout, (int, float)):
+                kwargs["pool_timeout"] = connect_timeout
+        return super().urlopen(method, url, *args, **kwargs)
+
+
+class BoundedWaitAdapter(HTTPAdapter):
+    """HTTPAdapter on _BoundedWaitPool; a full pool raises ConnectTimeout like a backend slow to accept."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(self.poolmanager.pool_classes_by_scheme,
+                                                       http=_BoundedWaitPool)
+
+    def send(self, request, **kwargs):
+        try:
+            return super().send(request, **kwargs)
+        except EmptyPoolError as e:
+            raise ConnectTimeout(e, request=request)
+
+
+class BackendPools:
+    """Keep-alive HTTP connection pools, one requests.Session per backend hostname.
+
+    Pools are opened when a server is registered and closed when it is removed.
+    A request that finds all max_connections in use waits for one at most as
+    long as its timeout, then fails with ConnectTimeout so the caller can try
+    another backend.
+    A pool that has not been used for idle_timeout seconds is closed on the next
+    sweep, which runs lazily from session() so no extra thread is needed.
+    """
+
+    def __init__(self, max_connections=50, idle_timeout=60):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.sessions = {}  # hostname -> requests.Session
+        self.last_used = {}  # hostname -> monotonic time of last checkout
+        self.lock = threading.Lock()
+        self.last_sweep = time.monotonic()
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = BoundedWaitAdapter(pool_connections=1, pool_maxsize=self.max_connections, pool_block=True)
+        session.mount('http://', adapter)
+        return session
+
+    def open(self, hostname):
+        """Create the pool for a newly registered backend, returning its session."""
+        with self.lock:
+            if hostname not in self.sessions:
+                self.sessions[hostname] = self._new_session()
+            self.last_used[hostname] = time.monotonic()
+            return self.sessions[hostname]
+
+    def close(self, hostname):
+        """Close a backend's pool and all of its idle connections."""
+        with self.lock:
+            session = self.sessions.pop(hostname, None)
+            self.last_used.pop(hostname, None)
+        if session is not None:
+            session.close()
+
+    def session(self, hostname):
+        """The pooled session for a backend, reopening it if it was evicted."""
+        now = time.monotonic()
+        if now - self.last_sweep > self.idle_timeout / 2:
+            self.evict_idle(now)
+
+        session = self.sessions.get(hostname)
+        if session is None:
+            return self.open(hostname)
+        self.last_used[hostname] = now
+        return session
+
+    def evict_idle(self, now=None):
+        """Close pools that have been idle for longer than idle_timeout."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.last_sweep = now
+            idle = [hostname for hostname, used in self.last_used.items()
+                    if now - used > self.idle_timeout]
+            sessions = [self.sessions.pop(hostname) for hostname in idle]
+            for hostname in idle:
+                del self.last_used[hostname]
+        for session in sessions:
+            session.close()
+        return idle
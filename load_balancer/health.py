@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from structured_log import log
+
+
+class BackendHealth:
+    """Probe history for one backend."""
+
+    def __init__(self):
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.last_checked = None
+        self.last_latency_ms = None
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            "healthy": self.healthy,
+            "consecutive_failures": self.consecutive_failures,
+            "consecutive_successes": self.consecutive_successes,
+            "last_checked": self.last_checked,
+            "last_latency_ms": self.last_latency_ms,
+            "last_error": self.last_error
+        }
+
+
+class HealthChecker:
+    """Background thread that probes every backend's /heartbeat concurrently.
+
+    A backend is marked down after failure_threshold consecutive failed probes
+    and up again after success_threshold consecutive successes; on_down and
+    on_up are called on each transition so the caller can eject or restore it.
+    on_checked, if given, gets report() after every round.
+    """
+
+    def __init__(self, get_backends, url_for, on_down, on_up,
+                 interval=5, timeout=1, failure_threshold=3, success_threshold=2, max_workers=32, on_checked=None):
+        self.get_backends = get_backends  # () -> list of hostnames to probe
+        self.url_for = url_for  # hostname -> base URL
+        self.on_down = on_down
+        self.on_up = on_up
+        self.on_checked = on_checked
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.success_threshold = success_threshold
+        self.status = {}  # hostname -> BackendHealth
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="health")
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.interval <= 0 or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="health-checker", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check_all()
+            except Exception as e:
+                log.error("Health check round failed", error=repr(e))
+
+    def _probe(self, hostname):
+        """Return (ok, latency_ms, error) for one /heartbeat request."""
+        start = time.monotonic()
+        try:
+            response = requests.get(f"{self.url_for(hostname)}/heartbeat", timeout=self.timeout)
+            latency_ms = round((time.monotonic() - start) * 1000, 2)
+            if response.status_code == 200:
+                return True, latency_ms, None
+            return False, latency_ms, f"HTTP {response.status_code}"
+        except Exception as e:
+            return False, None, str(e)
+
+    def check_all(self):
+        """Probe all backends once and apply the up/down thresholds."""
+        hostnames = list(self.get_backends())
+        for hostname in list(self.status):
+            if hostname not in hostnames:
+                del self.status[hostname]  # Removed through /rm
+
+        results = self.executor.map(self._probe, hostnames)
+        for hostname, (ok, latency_ms, error) in zip(hostnames, results):
+            health = self.status.setdefault(hostname, BackendHealth())
+            health.last_checked = time.time()
+            health.last_latency_ms = latency_ms
+            health.last_error = error
+
+            if ok:
+                health.consecutive_successes += 1
+                health.consecutive_failures = 0
+                if not health.healthy and health.consecutive_successes >= self.success_threshold:
+                    health.healthy = True
+                    self.on_up(hostname)
+            else:
+                health.consecutive_failures += 1
+                health.consecutive_successes = 0
+                if health.healthy and health.consecutive_failures >= self.failure_threshold:
+                    health.healthy = False
+                    self.on_down(hostname)
+
+        if self.on_checked is not None:
+            self.on_checked(self.report())
+
+    def mark_down(self, hostname):
+        """Start hostname as unhealthy, so on_up fires once it passes success_threshold probes."""
+        health = self.status.setdefault(hostname, BackendHealth())
+        health.healthy = False
+        health.consecutive_successes = 0
+
+    def is_healthy(self, hostname):
+        health = self.status.get(hostname)
+        return health is None or health.healthy
+
+    def report(self):
+        return {hostname: health.to_dict() for hostname, health in list(self.status.items())}
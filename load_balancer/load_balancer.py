@@ -3,175 +3,746 @@ import json
 import random
 import string
 import requests
-from flask import Flask, request, jsonify
-from consistent_hash import HashRing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import Flask, request, jsonify, Response
+from connection_pool import BackendPools
+from health import HealthChecker
+from lookup_engines import ENGINES
+from metrics import CONTENT_TYPE, LOOKUP_BUCKETS, Metrics
+from provisioning import DRIVERS, ScaleJob
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from ring_snapshot import RingSnapshot
+import ring_store
+from shared_ring import SharedRing, SharedStatus
+from routing_key import DEFAULT_ROUTING_KEY, RoutingKeyExtractor
+from strategies import STRATEGIES, PeakEwma, parse_route_strategies, strategy_for_path
+from structured_log import log
 
 app = Flask(__name__)
 
+PORT = int(os.getenv("PORT", "5000"))
+UPSTREAM_TIMEOUT = 5  # seconds
+ROUTE_ATTEMPTS = int(os.getenv("ROUTE_ATTEMPTS", "3"))  # distinct backends tried per request
+ROUTE_BUDGET = float(os.getenv("ROUTE_BUDGET", "5"))  # total seconds across all attempts
+# Bounded-load routing: a node above (1 + ε) × average in-flight requests passes keys on; unset disables
+BOUNDED_LOAD_EPSILON = float(os.getenv("BOUNDED_LOAD_EPSILON")) if os.getenv("BOUNDED_LOAD_EPSILON") else None
+MAX_CONNECTIONS_PER_BACKEND = int(os.getenv("MAX_CONNECTIONS_PER_BACKEND", "50"))
+IDLE_TIMEOUT = float(os.getenv("IDLE_TIMEOUT", "60"))  # seconds before an unused pool is closed
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))  # seconds, 0 disables
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "1"))
+HEALTH_FAILURE_THRESHOLD = int(os.getenv("HEALTH_FAILURE_THRESHOLD", "3"))
+HEALTH_SUCCESS_THRESHOLD = int(os.getenv("HEALTH_SUCCESS_THRESHOLD", "2"))
+PROVISION_WORKERS = int(os.getenv("PROVISION_WORKERS", "8"))  # concurrent server starts/stops
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "30"))  # seconds a new server has to answer /heartbeat
+MAX_JOBS = 100  # finished scale jobs kept for polling
+LOOKUP_ENGINE = os.getenv("LOOKUP_ENGINE", "ring")  # ring, maglev or rendezvous
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "0"))  # cached responses, 0 disables the cache
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "0"))  # seconds, for responses without Cache-Control
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "0") == "1"  # coalesce concurrent identical GETs into one upstream call
+SHARED_RING = os.getenv("SHARED_RING")  # shared memory segment holding the membership, set by workers.py
+SHARED_STATUS = os.getenv("SHARED_STATUS")  # shared memory segment holding scale jobs and health, set by workers.py
+WORKER_INDEX = int(os.getenv("LB_WORKER_INDEX", "0"))  # this process's index among the workers
+RING_SNAPSHOT_PATH = os.getenv("RING_SNAPSHOT_PATH", "")  # membership saved here for warm restarts; empty disables
+
+class RoutingError(Exception):
+    """A proxied request that cannot be routed, carrying the error response to send."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.body = {"message": message, "status": "failure"}
+        self.status = status
+
 class LoadBalancer:
     def __init__(self):
-        self.hash_ring = HashRing(num_nodes=0, ring_size=512, replicas=100)
-        self.servers = {}  # hostname -> node_id
-        self.node_to_hostname = {}  # node_id -> hostname
+        if LOOKUP_ENGINE not in ENGINES:
+            raise ValueError(f"Unknown lookup engine: {LOOKUP_ENGINE}")
+        # Membership is published as immutable snapshots, so request threads read it without locking.
+        # hash_ring is whichever lookup engine is configured; they all share HashRing's interface.
+        self.snapshot = RingSnapshot(ENGINES[LOOKUP_ENGINE]())
         self.next_node_id = 0
+        # Serialises writers building the next snapshot; reentrant so writers can sync from the shared ring
+        self.membership_lock = threading.RLock()
+        # With several worker processes, snapshots are also published to shared memory for the others
+        self.shared_ring = SharedRing.attach(SHARED_RING) if SHARED_RING else None
+        # ...and scale jobs and health results too, since any worker may be asked for them
+        self.shared_status = SharedStatus.attach(SHARED_STATUS) if SHARED_STATUS else None
+        self.driver = DRIVERS[os.getenv("LB_DRIVER", "docker")]()
+        self.provisioner = ThreadPoolExecutor(max_workers=PROVISION_WORKERS, thread_name_prefix="provision")
+        self.pending = set()  # hostnames being started but not yet on the ring
+        self.jobs = {}  # job_id -> ScaleJob, oldest first
+        self.key_extractor = RoutingKeyExtractor(os.getenv("ROUTING_KEY", DEFAULT_ROUTING_KEY))
+        self.pools = BackendPools(MAX_CONNECTIONS_PER_BACKEND, IDLE_TIMEOUT)
+        # Per process: under workers.py, bounded-load and in-flight based strategies see only this worker's requests
+        self.in_flight = {}  # node_id -> requests currently proxied to it
+        self.in_flight_lock = threading.Lock()
+        self.latency = PeakEwma()  # node_id -> peak-EWMA upstream latency
+        # e.g. "/home=p2c,/=ring": longest matching prefix picks the balancing strategy
+        self.route_strategies = parse_route_strategies(os.getenv("ROUTE_STRATEGIES", ""))
+        self.response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL) \
+            if RESPONSE_CACHE_SIZE > 0 else None
+        self.single_flight = SingleFlight() if SINGLE_FLIGHT else None
+        self.metrics = self._create_metrics()
+        self.health_checker = HealthChecker(
+            lambda: list(self._sync().servers), self.server_url, self._eject_server, self._restore_server,
+            interval=HEALTH_CHECK_INTERVAL, timeout=HEALTH_CHECK_TIMEOUT,
+            failure_threshold=HEALTH_FAILURE_THRESHOLD, success_threshold=HEALTH_SUCCESS_THRESHOLD,
+            on_checked=self._share_health if self.shared_status is not None else None)
 
-        # Register initial servers (from docker-compose)
-        self._register_existing_server("Server1")
-        self._register_existing_server("Server2")
-        self._register_existing_server("Server3")
+        if self.shared_ring is None or WORKER_INDEX == 0:
+            # Warm restart: saved servers that are still running keep their node ids and ring positions.
+            # The initial servers are only registered when there is nothing to restore.
+            if not (RING_SNAPSHOT_PATH and self._warm_start()):
+                # Register initial servers (from docker-compose, or started by the local driver)
+                self._register_existing_server("Server1")
+                self._register_existing_server("Server2")
+                self._register_existing_server("Server3")
+            self.health_checker.start()  # One prober is enough; ejections reach the other workers through the ring
+        else:
+            self._sync()  # Worker 0 has already set up the membership
 
-    def _register_existing_server(self, hostname):
-        """Register an existing Docker container in the hash ring."""
-        if hostname not in self.servers:
+    # Read-only views of the current snapshot; writers go through _publish()
+    @property
+    def hash_ring(self):
+        return self.snapshot.hash_ring
+
+    @property
+    def servers(self):
+        return self.snapshot.servers
+
+    @property
+    def node_to_hostname(self):
+        return self.snapshot.node_to_hostname
+
+    @property
+    def weights(self):
+        return self.snapshot.weights
+
+    @contextmanager
+    def _writing(self):
+        """Hold the membership lock, and the shared ring's lock across workers, with the snapshot up to date."""
+        with self.membership_lock:
+            if self.shared_ring is None:
+                yield
+                return
+            with self.shared_ring.locked():
+                self._sync()
+                yield
+
+    def _publish(self, draft, operation):
+        """Swap in a fully built snapshot; must be called inside _writing()."""
+        if self.shared_ring is not None:
+            self.shared_ring.write(draft.version, draft.to_dict(self.next_node_id))
+        if RING_SNAPSHOT_PATH:
+            try:
+                ring_store.save(RING_SNAPSHOT_PATH, draft, self.next_node_id, LOOKUP_ENGINE)
+            except OSError as e:
+                log.error("Could not save ring snapshot", path=RING_SNAPSHOT_PATH, error=str(e))
+        self.snapshot = draft
+        self.metrics.inc("lb_membership_changes_total", operation=operation)
+
+    def _sync(self):
+        """Adopt the snapshot another worker last published to the shared ring, returning the current snapshot."""
+        snapshot = self.snapshot
+        if self.shared_ring is None or self.shared_ring.version() == snapshot.version:
+            return snapshot
+        with self.membership_lock:
+            previous = self.snapshot
+            state = self.shared_ring.read()
+            if state is None or state["version"] <= previous.version:
+                return previous
+            self.snapshot = RingSnapshot.from_dict(state, ENGINES[LOOKUP_ENGINE]())
+            self.next_node_id = state["next_node_id"]
+            self.metrics.inc("lb_membership_changes_total", operation="sync")
+
+        # Drop this worker's state for servers the other worker took off the ring
+        current = self.snapshot
+        if self.response_cache is not None:
+            for node_id in set(previous.hash_ring.get_nodes()) - set(current.hash_ring.get_nodes()):
+                self.response_cache.invalidate_node(node_id)
+        for hostname, node_id in previous.servers.items():
+            if hostname not in current.servers:
+                self.pools.close(hostname)
+                self.latency.forget(node_id)
+        return current
+
+    def _create_metrics(self):
+        metrics = Metrics()
+        metrics.counter("lb_upstream_responses_total", "Upstream responses by backend and HTTP status code")
+        metrics.counter("lb_upstream_errors_total", "Failed upstream attempts by backend and reason (timeout, connection, http_5xx)")
+        metrics.histogram("lb_upstream_latency_seconds", "Upstream request latency by backend")
+        metrics.histogram("lb_ring_lookup_seconds", "Time to pick the preference list for a request", LOOKUP_BUCKETS)
+        metrics.counter("lb_single_flight_requests_total", "Coalesced GETs by role: leaders call upstream, followers share the result")
+        metrics.counter("lb_membership_changes_total", "Published ring snapshots by operation")
+        metrics.gauge("lb_in_flight_requests", "Requests currently proxied to each backend", self._in_flight_samples)
+        metrics.gauge("lb_ring_vnodes", "Ring positions per backend (virtual servers, or Maglev table entries)", lambda: [
+            ({"backend": self.node_to_hostname.get(node_id, str(node_id))}, slots)
+            for node_id, slots in self.hash_ring.get_node_slots().items()])
+        metrics.gauge("lb_ring_nodes", "Backends currently on the ring", lambda: [({}, len(self.hash_ring.get_nodes()))])
+        metrics.gauge("lb_ring_occupied_slots", "Occupied ring positions", lambda: [({}, self.hash_ring.get_ring_status()["occupied_slots"])])
+        metrics.gauge("lb_ring_occupancy_ratio", "Occupied fraction of the ring's position space", self._occupancy_samples)
+        metrics.gauge("lb_log_dropped_records", "Log records dropped because the writer fell behind", lambda: [({}, log.dropped)])
+        metrics.gauge("lb_response_cache", "Response cache counters and size, by stat", self._cache_samples)
+        metrics.gauge("lb_ring_version", "Version of the published ring snapshot", lambda: [({}, self.snapshot.version)])
+        return metrics
+
+    def _in_flight_samples(self):
+        node_to_hostname = self.node_to_hostname
+        return [({"backend": node_to_hostname.get(node_id, str(node_id))}, count)
+                for node_id, count in list(self.in_flight.items())]
+
+    def _occupancy_samples(self):
+        status = self.hash_ring.get_ring_status()
+        if not status["total_slots"]:
+            return []  # Rendezvous hashing has no positions
+        return [({}, status["occupied_slots"] / status["total_slots"])]
+
+    def _cache_samples(self):
+        if self.response_cache is None:
+            return []
+        return [({"stat": name}, value) for name, value in self.response_cache.stats().items()]
+
+    def metrics_text(self):
+        """Prometheus text exposition of all metrics, with its content type."""
+        return self.metrics.render(), CONTENT_TYPE
+
+    def _warm_start(self):
+        """Reload the membership saved by the previous run, keeping only servers that still answer /heartbeat.
+
+        Servers that were ejected when the snapshot was saved come back registered but off the ring,
+        and the health checker restores them once they pass its probes. Returns whether any server was restored.
+        """
+        try:
+            state = ring_store.load(RING_SNAPSHOT_PATH)
+        except (OSError, ValueError) as e:
+            log.error("Could not read ring snapshot", path=RING_SNAPSHOT_PATH, error=str(e))
+            return False
+        if state is None:
+            return False
+
+        start = time.monotonic()
+        saved = state["servers"]
+        alive = list(self.provisioner.map(lambda server: self._answers_heartbeat(server["url"]), saved))
+        # Other engines rebuild their lookup structures from node ids and weights alone
+        same_engine = state["engine"] == LOOKUP_ENGINE
+        with self._writing():
+            draft = self.snapshot.copy()
+            unplaced = {}  # node_id -> weight, for servers without usable saved positions
+            ejected = []  # servers that were off the ring when saved
+            for server, ok in zip(saved, alive):
+                hostname, node_id, weight = server["hostname"], server["node_id"], server["weight"]
+                if not ok:
+                    log.warn("Dropping saved server that no longer answers", hostname=hostname, node_id=node_id)
+                    continue
+                if not server["on_ring"]:
+                    # Stays registered but off the ring until the health checker sees it recover
+                    ejected.append(hostname)
+                elif not (same_engine and server["positions"] and
+                          draft.hash_ring.add_node_at(node_id, weight, server["positions"])):
+                    unplaced[node_id] = weight
+                draft.servers[hostname] = node_id
+                draft.node_to_hostname[node_id] = hostname
+                draft.weights[hostname] = weight
+                draft.urls[hostname] = server["url"]
+            # One bulk load, so engines that rebuild a whole table do it once
+            for node_id in draft.hash_ring.add_nodes(unplaced):
+                hostname = draft.node_to_hostname.pop(node_id)
+                log.error("Hash ring rejected saved server", hostname=hostname, node_id=node_id)
+                del draft.servers[hostname], draft.weights[hostname], draft.urls[hostname]
+            for hostname, url in draft.urls.items():
+                self.driver.attach(hostname, url)
+            # Node ids are never reused, even for servers dropped above
+            self.next_node_id = max(self.next_node_id, state["next_node_id"])
+            draft.version = max(draft.version, state["version"] + 1)
+            self._publish(draft, "warm_start")
+        for hostname in draft.servers:
+            self.pools.open(hostname)
+        for hostname in ejected:
+            self.health_checker.mark_down(hostname)
+        log.info("Warm start from ring snapshot", path=RING_SNAPSHOT_PATH, restored=len(draft.servers),
+                 dropped=len(saved) - len(draft.servers), ejected=len(ejected),
+                 duration_ms=round((time.monotonic() - start) * 1000, 2))
+        return bool(draft.servers)
+
+    def _answers_heartbeat(self, url):
+        try:
+            return requests.get(f'{url}/heartbeat', timeout=HEALTH_CHECK_TIMEOUT).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def _register_node(self, hostname, weight=1.0):
+        """Place a hostname on the hash ring, returning its node_id or None if it was rejected."""
+        with self._writing():
+            if hostname in self.servers:
+                log.warn("Server already registered", hostname=hostname)
+                return None
             node_id = self.next_node_id
-            self.hash_ring.add_node(node_id)
-            self.servers[hostname] = node_id
-            self.node_to_hostname[node_id] = hostname
+            draft = self.snapshot.copy()
+            if not draft.hash_ring.add_node(node_id, weight):
+                log.error("Hash ring rejected server", hostname=hostname, node_id=node_id)
+                return None
+            draft.servers[hostname] = node_id
+            draft.node_to_hostname[node_id] = hostname
+            draft.weights[hostname] = weight
+            draft.urls[hostname] = self.driver.url(hostname)
             self.next_node_id += 1
-            print(f"[INFO] Registered existing server: {hostname} (node_id: {node_id})")
+            self._publish(draft, "add")
+        self.pools.open(hostname)
+        return node_id
+
+    def _register_existing_server(self, hostname):
+        """Register an existing server in the hash ring."""
+        if hostname not in self._sync().servers and self.driver.adopt(hostname):
+            node_id = self._register_node(hostname)
+            if node_id is not None:
+                log.info("Registered existing server", hostname=hostname, node_id=node_id)
 
     def _generate_hostname(self):
         return ''.join(random.choices(string.ascii_letters + string.digits, k=8))
 
-    def _spawn_server(self, hostname=None):
-        """Dynamically start a Docker container and register it."""
-        if hostname is None:
-            hostname = self._generate_hostname()
+    def _spawn_server(self, hostname, weight=1.0):
+        """Start a server through the driver and register it once /heartbeat answers."""
+        try:
+            if not self.driver.start(hostname):
+                log.error("Failed to spawn server", hostname=hostname)
+                return False
 
-        if hostname in self.servers:
-            print(f"[WARN] Server {hostname} already exists.")
-            return False
+            if not self._wait_until_ready(hostname):
+                log.error("Server not ready", hostname=hostname, timeout=READY_TIMEOUT)
+                self.driver.stop(hostname)
+                return False
 
-        cmd = f"docker run --name {hostname} --network load_balancer_net1 --network-alias {hostname} -e NODE_ID={hostname} -d server"
-        print(f"[DEBUG] Spawning server: {cmd}")
-        result = os.popen(cmd).read().strip()
-        print(f"[DEBUG] Docker result: {result}")
+            node_id = self._register_node(hostname, weight)
+            if node_id is None:
+                # Don't leave a server running that can never receive traffic
+                self.driver.stop(hostname)
+                return False
+        finally:
+            self.pending.discard(hostname)
 
-        if result:
-            node_id = self.next_node_id
-            self.hash_ring.add_node(node_id)
-            self.servers[hostname] = node_id
-            self.node_to_hostname[node_id] = hostname
-            self.next_node_id += 1
-            print(f"[INFO] Spawned and registered new server: {hostname} (node_id: {node_id})")
-            return True
+        log.info("Spawned and registered new server", hostname=hostname, node_id=node_id)
+        return True
+
+    def _wait_until_ready(self, hostname):
+        """Poll /heartbeat until the new server answers or READY_TIMEOUT passes."""
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._answers_heartbeat(self.server_url(hostname)):
+                return True
+            time.sleep(0.2)
+        return False
+
+    def _deregister_server(self, hostname):
+        """Take a server off the ring and out of the registry, returning its base URL or None if it was unknown."""
+        with self._writing():
+            if hostname not in self.servers:
+                return None
+            url = self.server_url(hostname)
+            draft = self.snapshot.copy()
+            node_id = draft.servers.pop(hostname)
+            draft.hash_ring.remove_node(node_id)
+            del draft.node_to_hostname[node_id]
+            del draft.weights[hostname]
+            draft.urls.pop(hostname, None)
+            self._publish(draft, "remove")
+        if self.response_cache is not None:
+            self.response_cache.invalidate_node(node_id)
+        self.pools.close(hostname)
+        self.latency.forget(node_id)
+        log.info("Removed server", hostname=hostname, node_id=node_id)
+        return url
+
+    def _remove_server(self, hostname, url):
+        """Stop a server that has already been deregistered, returning whether it stopped.
+
+        Its URL lets the driver find servers started by another worker or an earlier run.
+        """
+        return self.driver.stop(hostname, url)
+
+    def _eject_server(self, hostname):
+        """Take an unhealthy server off the hash ring while keeping it registered."""
+        with self._writing():
+            node_id = self.servers.get(hostname)
+            draft = self.snapshot.copy()
+            if node_id is None or not draft.hash_ring.remove_node(node_id):
+                return
+            self._publish(draft, "eject")
+        if self.response_cache is not None:
+            self.response_cache.invalidate_node(node_id)
+        log.warn("Ejected unhealthy server from ring", hostname=hostname, node_id=node_id)
+
+    def _restore_server(self, hostname):
+        """Put a recovered server back on the ring; its node_id keeps its old ring positions."""
+        with self._writing():
+            node_id = self.servers.get(hostname)
+            draft = self.snapshot.copy()
+            if node_id is None or not draft.hash_ring.add_node(node_id, draft.weights[hostname]):
+                return
+            self._publish(draft, "restore")
+        log.info("Restored recovered server to ring", hostname=hostname, node_id=node_id)
+
+    @contextmanager
+    def track_request(self, hostname):
+        """Count a request as in flight to hostname for as long as the block runs, and time it."""
+        node_id = self.servers.get(hostname)
+        with self.in_flight_lock:
+            self.in_flight[node_id] = self.in_flight.get(node_id, 0) + 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.latency.observe(node_id, elapsed)
+            self.metrics.observe("lb_upstream_latency_seconds", elapsed, backend=hostname)
+            with self.in_flight_lock:
+                self.in_flight[node_id] -= 1
+                if not self.in_flight[node_id]:
+                    del self.in_flight[node_id]
+
+    def log_access(self, path, status, hostname, attempts, start, client_ip):
+        """Write a sampled access-log record for a proxied request that began at monotonic time start."""
+        if log.sampled():
+            log.access(path=path, status=status, backend=hostname, attempts=attempts, client=client_ip,
+                       duration_ms=round((time.monotonic() - start) * 1000, 2))
+
+    def cached_response(self, request_key):
+        """(body, status) of a fresh cached response, or None."""
+        if request_key is None or self.response_cache is None:
+            return None
+        return self.response_cache.get(request_key)
+
+    def cache_response(self, request_key, hostname, body, status, cache_control):
+        """Offer an upstream 200 response to the cache; its Cache-Control decides whether it is kept."""
+        if request_key is not None and self.response_cache is not None and status == 200:
+            node_id = self.servers.get(hostname)
+            if node_id is not None:
+                self.response_cache.put(request_key, node_id, body, status, cache_control)
+
+    def server_url(self, hostname):
+        """Base URL of a backend server; the snapshot also knows servers started by other workers."""
+        return self.snapshot.urls.get(hostname) or self.driver.url(hostname)
+
+    def _start_job(self, operation, hostnames, task):
+        """Run task(hostname) for every hostname in the provisioning pool, tracked as a ScaleJob."""
+        job = ScaleJob(operation, hostnames)
+        with self.membership_lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > MAX_JOBS:
+                del self.jobs[next(iter(self.jobs))]
+        self._share_job(job)
+
+        def run(hostname):
+            try:
+                ok = task(hostname)
+            except Exception as e:
+                log.error("Scale job task failed", operation=operation, hostname=hostname, error=repr(e))
+                ok = False
+            job.record(hostname, ok)
+            self._share_job(job)
+
+        for hostname in hostnames:
+            self.provisioner.submit(run, hostname)
+        return job
+
+    def _job_response(self, job, wait):
+        """Block until the job is done and report replicas, or hand back its id straight away."""
+        if not wait:
+            return {"message": job.to_dict(), "status": "successful"}, 202
+        job.done.wait()
+        body = self.replica_status()
+        body["message"]["job"] = job.to_dict()
+        return body, 200
+
+    def _share_job(self, job):
+        """Publish a job's progress so that every worker can answer /jobs/<id> for it."""
+        if self.shared_status is None:
+            return
+
+        def change(state):
+            jobs = state["jobs"]
+            jobs[job.id] = job.to_dict()
+            while len(jobs) > MAX_JOBS:
+                del jobs[next(iter(jobs))]
+
+        self.shared_status.update(change)
+
+    def _share_health(self, report):
+        """Publish worker 0's probe results for the /rep of every worker."""
+        self.shared_status.update(lambda state: state.update(health=report))
+
+    def job_status(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            record = job.to_dict()
+        elif self.shared_status is not None:
+            record = self.shared_status.read()["jobs"].get(job_id)  # Started by another worker
         else:
-            print(f"[ERROR] Failed to spawn server: {hostname}")
-            return False
+            record = None
+        if record is None:
+            return {"message": f"<Error> Unknown job: {job_id}", "status": "failure"}, 404
+        return {"message": record, "status": "successful"}, 200
 
-    def _remove_server(self, hostname):
-        if hostname not in self.servers:
-            return False
+    def health_report(self):
+        """Probe results per server; only worker 0 probes, and the others report what it shared."""
+        if self.shared_status is None or WORKER_INDEX == 0:
+            return self.health_checker.report()
+        return self.shared_status.read()["health"]
 
-        os.system(f'docker stop {hostname} && docker rm {hostname}')
-        node_id = self.servers[hostname]
-        self.hash_ring.remove_node(node_id)
-        del self.servers[hostname]
-        del self.node_to_hostname[node_id]
-        print(f"[INFO] Removed server: {hostname} (node_id: {node_id})")
-        return True
+    def replica_status(self):
+        snapshot = self._sync()
+        replicas = list(snapshot.servers.keys())
+        return {
+            "message": {
+                "N": len(replicas),
+                "replicas": replicas,
+                "weights": dict(snapshot.weights),
+                "ring_version": snapshot.version,
+                "lookup_engine": LOOKUP_ENGINE,
+                "worker": WORKER_INDEX,
+                "cache": self.response_cache.stats() if self.response_cache is not None else None,
+                "health": self.health_report()
+            },
+            "status": "successful"
+        }
+
+    def add_servers(self, n, hostnames, weights=None, wait=True):
+        """Start n servers concurrently, naming them from hostnames first. Returns (body, status)."""
+        weights = weights or {}
+        if len(hostnames) > n:
+            return {
+                "message": "<Error> Length of hostname list is more than newly added instances",
+                "status": "failure"
+            }, 400
+        if not self._valid_weights(weights):
+            return {
+                "message": "<Error> Weights must be positive numbers",
+                "status": "failure"
+            }, 400
+
+        to_start = []
+        self._sync()
+        with self.membership_lock:
+            for i in range(n):
+                hostname = hostnames[i] if i < len(hostnames) else self._generate_hostname()
+                if hostname in self.servers or hostname in self.pending:
+                    log.warn("Server already exists", hostname=hostname)
+                    continue
+                self.pending.add(hostname)
+                to_start.append(hostname)
+
+        job = self._start_job("add", to_start,
+                              lambda hostname: self._spawn_server(hostname, weights.get(hostname, 1.0)))
+        return self._job_response(job, wait)
+
+    def set_weights(self, weights):
+        """Reweight registered servers, moving only the virtual servers they gain or lose. Returns (body, status)."""
+        if not self._valid_weights(weights) or any(hostname not in self._sync().servers for hostname in weights):
+            return {
+                "message": "<Error> Weights must be positive numbers for registered servers",
+                "status": "failure"
+            }, 400
+
+        with self._writing():
+            draft = self.snapshot.copy()
+            for hostname, weight in weights.items():
+                node_id = draft.servers.get(hostname)
+                if node_id is None:
+                    continue  # Removed since the check above
+                # Servers ejected by the health checker pick up the new weight when restored
+                if node_id in draft.hash_ring.node_weights and not draft.hash_ring.set_weight(node_id, weight):
+                    log.error("Hash ring rejected weight", hostname=hostname, weight=weight)
+                    continue
+                draft.weights[hostname] = weight
+                log.info("Set weight", hostname=hostname, weight=weight, node_id=node_id)
+            self._publish(draft, "reweight")
+
+        return self.replica_status(), 200
+
+    def _valid_weights(self, weights):
+        return isinstance(weights, dict) and all(
+            isinstance(weight, (int, float)) and not isinstance(weight, bool) and weight > 0
+            for weight in weights.values())
+
+    def remove_servers(self, n, hostnames, wait=True):
+        """Remove n servers, the named ones first and then at random. Returns (body, status).
+
+        Servers leave the ring straight away; stopping them runs in the provisioning pool.
+        """
+        if len(hostnames) > n:
+            return {
+                "message": "<Error> Length of hostname list is more than removable instances",
+                "status": "failure"
+            }, 400
+
+        removed = {}  # hostname -> base URL
+        for hostname in hostnames:
+            if len(removed) < n:
+                url = self._deregister_server(hostname)
+                if url is not None:
+                    removed[hostname] = url
+
+        remaining_servers = list(self._sync().servers.keys())
+        while len(removed) < n and remaining_servers:
+            hostname = random.choice(remaining_servers)
+            remaining_servers.remove(hostname)
+            url = self._deregister_server(hostname)
+            if url is not None:
+                removed[hostname] = url
+
+        job = self._start_job("rm", list(removed), lambda hostname: self._remove_server(hostname, removed[hostname]))
+        return self._job_response(job, wait)
+
+    def _request_key(self, path, query, routing_key):
+        """Identity of a GET for the response cache and request coalescing, or None if both are off."""
+        if self.response_cache is None and not SINGLE_FLIGHT:
+            return None
+        return ("GET", path, tuple(sorted(query.items())), routing_key)
+
+    def select_servers(self, headers, cookies, query, path, client_ip):
+        """Preference list of backend hostnames for a proxied request, and its request key.
+
+        Raises RoutingError if there is no backend. The request key identifies
+        identical GETs for caching and coalescing; it is None when they can't
+        repeat, e.g. for requests with a random routing key.
+        """
+        # One snapshot for the whole lookup, so every node_id on its ring has a hostname
+        snapshot = self._sync()
+        if not snapshot.servers:
+            raise RoutingError("<Error> No server replicas available", 500)
+
+        strategy = strategy_for_path(self.route_strategies, path)
+        if strategy != "ring":
+            nodes = snapshot.hash_ring.get_nodes()  # Ring members, so ejected servers are skipped
+            if not nodes:
+                raise RoutingError("<Error> No server available", 500)
+            node_ids = STRATEGIES[strategy].choose(nodes, self.in_flight, self.latency, ROUTE_ATTEMPTS)
+            hostnames = [snapshot.node_to_hostname[node_id] for node_id in node_ids]
+            if log.enabled("debug"):
+                log.debug("Route", strategy=strategy, hostname=hostnames[0], node_id=node_ids[0])
+            # Strategy routes don't need affinity, so any backend's response will do
+            return hostnames, self._request_key(path, query, None)
+
+        routing_key, key_source = self.key_extractor.extract(headers, cookies, query, path, client_ip)
+        if routing_key is None:
+            raise RoutingError("<Error> Request has no routing key", 400)
+
+        start = time.perf_counter()
+        if BOUNDED_LOAD_EPSILON is None:
+            node_ids = snapshot.hash_ring.get_preference_list(routing_key, ROUTE_ATTEMPTS)
+        else:
+            node_ids = snapshot.hash_ring.get_bounded_preference_list(
+                routing_key, ROUTE_ATTEMPTS, self.in_flight, BOUNDED_LOAD_EPSILON)
+        self.metrics.observe("lb_ring_lookup_seconds", time.perf_counter() - start)
+        if not node_ids:
+            raise RoutingError("<Error> No server available", 500)
+
+        hostnames = [snapshot.node_to_hostname[node_id] for node_id in node_ids]
+        if log.enabled("debug"):
+            log.debug("Route", key=routing_key, key_source=key_source, hostname=hostnames[0], node_id=node_ids[0])
+        request_key = self._request_key(path, query, routing_key) if key_source != "random" else None
+        return hostnames, request_key
 
 lb = LoadBalancer()
 
 @app.route('/rep', methods=['GET'])
 def get_replicas():
-    replicas = list(lb.servers.keys())
-    return jsonify({
-        "message": {
-            "N": len(replicas),
-            "replicas": replicas
-        },
-        "status": "successful"
-    }), 200
+    return jsonify(lb.replica_status()), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    body, content_type = lb.metrics_text()
+    return body, 200, {'Content-Type': content_type}
 
 @app.route('/add', methods=['POST'])
 def add_servers():
     data = request.get_json()
-    n = data.get('n', 0)
-    hostnames = data.get('hostnames', [])
-
-    if len(hostnames) > n:
-        return jsonify({
-            "message": "<Error> Length of hostname list is more than newly added instances",
-            "status": "failure"
-        }), 400
-
-    for i in range(n):
-        hostname = hostnames[i] if i < len(hostnames) else None
-        lb._spawn_server(hostname)
-
-    replicas = list(lb.servers.keys())
-    return jsonify({
-        "message": {
-            "N": len(replicas),
-            "replicas": replicas
-        },
-        "status": "successful"
-    }), 200
+    body, status = lb.add_servers(data.get('n', 0), data.get('hostnames', []), data.get('weights'),
+                                  wait=not data.get('async', False))
+    return jsonify(body), status
+
+@app.route('/weight', methods=['PUT'])
+def set_weights():
+    data = request.get_json()
+    body, status = lb.set_weights(data.get('weights', {}))
+    return jsonify(body), status
 
 @app.route('/rm', methods=['DELETE'])
 def remove_servers():
     data = request.get_json()
-    n = data.get('n', 0)
-    hostnames = data.get('hostnames', [])
-
-    if len(hostnames) > n:
-        return jsonify({
-            "message": "<Error> Length of hostname list is more than removable instances",
-            "status": "failure"
-        }), 400
-
-    removed = 0
-    for hostname in hostnames:
-        if hostname in lb.servers and removed < n:
-            lb._remove_server(hostname)
-            removed += 1
-
-    remaining_servers = list(lb.servers.keys())
-    while removed < n and remaining_servers:
-        hostname = random.choice(remaining_servers)
-        lb._remove_server(hostname)
-        remaining_servers.remove(hostname)
-        removed += 1
-
-    replicas = list(lb.servers.keys())
-    return jsonify({
-        "message": {
-            "N": len(replicas),
-            "replicas": replicas
-        },
-        "status": "successful"
-    }), 200
+    body, status = lb.remove_servers(data.get('n', 0), data.get('hostnames', []),
+                                     wait=not data.get('async', False))
+    return jsonify(body), status
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    body, status = lb.job_status(job_id)
+    return jsonify(body), status
+
+def forward(path, hostnames, start, request_key):
+    """Send a GET upstream with failover, returning (body, status, hostname, attempts)."""
+    # GETs are idempotent, so a failed attempt moves on to the next node clockwise
+    deadline = start + ROUTE_BUDGET
+    error = "route budget exhausted"
+    attempts = 0
+    for attempt, hostname in enumerate(hostnames):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        attempts += 1
+        if attempt:
+            log.warn("Failing over", hostname=hostname, attempt=attempt + 1)
+        try:
+            session = lb.pools.session(hostname)
+            with lb.track_request(hostname):
+                response = session.get(f'{lb.server_url(hostname)}/{path}', timeout=min(UPSTREAM_TIMEOUT, remaining))
+            lb.metrics.inc("lb_upstream_responses_total", backend=hostname, code=response.status_code)
+            if response.status_code < 500:
+                lb.cache_response(request_key, hostname, response.content, response.status_code,
+                                  response.headers.get('Cache-Control'))
+                return response.content, response.status_code, hostname, attempts
+            error = f"HTTP {response.status_code}"
+            lb.metrics.inc("lb_upstream_errors_total", backend=hostname, reason="http_5xx")
+        except Exception as e:
+            error = e
+            reason = "timeout" if isinstance(e, requests.Timeout) else "connection"
+            lb.metrics.inc("lb_upstream_errors_total", backend=hostname, reason=reason)
+        log.error("Could not reach server", hostname=hostname, error=str(error))
+
+    return json.dumps({
+        "message": f"<Error> Failed to route to {hostname}: {error}",
+        "status": "failure"
+    }), 500, hostname, attempts
 
 @app.route('/<path:path>', methods=['GET'])
 def route_request(path):
-    if not lb.servers:
-        return jsonify({
-            "message": "<Error> No server replicas available",
-            "status": "failure"
-        }), 500
-
-    request_id = random.randint(100000, 999999)
-    node_id = lb.hash_ring.get_node_for_request(request_id)
+    start = time.monotonic()
+    try:
+        hostnames, request_key = lb.select_servers(
+            request.headers, request.cookies, request.args, path, request.remote_addr)
+    except RoutingError as e:
+        lb.log_access(path, e.status, None, 0, start, request.remote_addr)
+        return jsonify(e.body), e.status
 
-    if node_id is None:
-        return jsonify({
-            "message": "<Error> No server available",
-            "status": "failure"
-        }), 500
+    cached = lb.cached_response(request_key)
+    if cached is not None:
+        body, status = cached
+        lb.log_access(path, status, None, 0, start, request.remote_addr)
+        return Response(body, status, mimetype='application/json')
 
-    hostname = lb.node_to_hostname[node_id]
-    print(f"[ROUTE] Request {request_id} → {hostname} (node_id: {node_id})")
+    if lb.single_flight is not None and request_key is not None:
+        # Identical concurrent GETs wait for the first one's upstream call instead of repeating it
+        (body, status, hostname, attempts), shared = lb.single_flight.do(
+            request_key, lambda: forward(path, hostnames, start, request_key))
+        lb.metrics.inc("lb_single_flight_requests_total", role="follower" if shared else "leader")
+    else:
+        body, status, hostname, attempts = forward(path, hostnames, start, request_key)
 
-    try:
-        response = requests.get(f'http://{hostname}:5000/{path}', timeout=5)
-        return response.json(), response.status_code
-    except Exception as e:
-        print(f"[ERROR] Could not reach {hostname}: {e}")
-        return jsonify({
-            "message": f"<Error> Failed to route to {hostname}: {e}",
-            "status": "failure"
-        }), 500
+    lb.log_access(path, status, hostname, attempts, start, request.remote_addr)
+    return Response(body, status, mimetype='application/json')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=PORT)
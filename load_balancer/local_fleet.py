@@ -0,0 +1,161 @@
+"""Docker-free fleet: the load balancer and its servers as local processes.
+
+Runs load_balancer.py, async_proxy.py or workers.py with LB_DRIVER=local, so
+backends are server/server.py processes on local ports instead of
+containers, and /add, /rm and routing all work as they do under
+docker-compose. The whole fleet runs in its own process group and is
+stopped together, so no servers are left behind.
+
+    python local_fleet.py --servers 5              # serve on :5050 until Ctrl-C
+    python local_fleet.py --mode workers --workers 4
+
+or from a benchmark:
+
+    with LocalFleet(servers=5) as fleet:
+        requests.get(f"{fleet.url}/home")
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+SCRIPTS = {
+    "flask": "load_balancer.py",
+    "async": "async_proxy.py",
+    "workers": "workers.py",
+}
+HERE = os.path.dirname(os.path.abspath(__file__))
+INITIAL_SERVERS = 3  # Server1..3, registered by the load balancer at boot
+
+
+class LocalFleet:
+    """A load balancer on `port` in front of `servers` local backend processes."""
+
+    def __init__(self, servers=INITIAL_SERVERS, port=5050, mode="flask", workers=1, backend_base_port=18000,
+                 env=None, log_path=None, ready_timeout=60):
+        if mode not in SCRIPTS:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.servers = servers
+        self.port = port
+        self.mode = mode
+        self.workers = workers
+        self.backend_base_port = backend_base_port
+        self.env = env or {}
+        self.log_path = log_path
+        self.ready_timeout = ready_timeout
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        """Start the fleet and return once it routes to `servers` backends."""
+        env = dict(os.environ, LB_DRIVER="local", PORT=str(self.port), LB_WORKERS=str(self.workers),
+                   LOCAL_BASE_PORT=str(self.backend_base_port), LOG_LEVEL="warn")
+        env.update(self.env)
+        output = open(self.log_path, "ab") if self.log_path else subprocess.DEVNULL
+        try:
+            self.process = subprocess.Popen([sys.executable, SCRIPTS[self.mode]], cwd=HERE, env=env,
+                                            stdout=output, stderr=subprocess.STDOUT, start_new_session=True)
+        finally:
+            if self.log_path:
+                output.close()
+
+        try:
+            self._wait_until_ready()
+            self.scale(self.servers)
+        except Exception:
+            self.stop()
+            raise
+        return self
+
+    def _wait_until_ready(self):
+        """Poll /rep until the initial servers are registered and, in workers mode, every worker answers."""
+        deadline = time.monotonic() + self.ready_timeout
+        workers_seen = set()
+        expected_workers = self.workers if self.mode == "workers" else 1
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Load balancer exited with code {self.process.returncode}")
+            try:
+                status = self.replicas()
+                if status["N"] >= min(self.servers, INITIAL_SERVERS):
+                    workers_seen.add(status["worker"])
+                    if len(workers_seen) >= expected_workers:
+                        return
+                    continue  # Keep asking until the kernel has handed a request to every worker
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Fleet on port {self.port} was not ready after {self.ready_timeout}s")
+
+    def replicas(self):
+        """The load balancer's /rep message."""
+        return requests.get(f"{self.url}/rep", timeout=5).json()["message"]
+
+    def scale(self, servers):
+        """Add or remove servers until `servers` are registered."""
+        current = self.replicas()["N"]
+        if servers > current:
+            response = requests.post(f"{self.url}/add", json={"n": servers - current}, timeout=120)
+        elif servers < current:
+            response = requests.delete(f"{self.url}/rm", json={"n": current - servers}, timeout=120)
+        else:
+            return
+        response.raise_for_status()
+        self.servers = servers
+
+    def stop(self):
+        """Stop the load balancer and every server it started."""
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(timeout=10)
+        except ProcessLookupError:
+            pass
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+        # Servers started by the load balancer share its process group; take down any it left running
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', type=int, default=INITIAL_SERVERS)
+    parser.add_argument('--port', type=int, default=5050, help="load balancer port (5050 is what analysis/ expects)")
+    parser.add_argument('--mode', choices=sorted(SCRIPTS), default='flask')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes in workers mode")
+    parser.add_argument('--backend-base-port', type=int, default=18000)
+    parser.add_argument('--log', help="append the load balancer's output to this file")
+    args = parser.parse_args(argv)
+
+    fleet = LocalFleet(args.servers, args.port, args.mode, args.workers, args.backend_base_port, log_path=args.log)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with fleet:
+        print(f"Load balancer ({args.mode}) on {fleet.url} with {fleet.replicas()['N']} servers; Ctrl-C to stop")
+        try:
+            while fleet.process.poll() is None:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Prometheus text-format metrics for the load balancer, without extra dependencies.
+
+Counters and histograms are recorded into a per-thread shard, so the hot path
+is a couple of dict updates with no lock; a scrape folds the shards together.
+Gauges are read from live state by a callback when /metrics is scraped.
+"""
+import bisect
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOKUP_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3)
+
+
+class _Shard:
+    """Counters and histograms written by one thread only."""
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+    def merge(self, other):
+        for key, value in other.counters.copy().items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in other.histograms.copy().items():
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    mine[i] += value
+
+
+class Metrics:
+    """Registry of counters, histograms and gauges rendered in the Prometheus text format.
+
+    Labels are passed as keyword arguments and must be given in the same order
+    at every call site for one metric, since their order is part of the key.
+    """
+
+    def __init__(self):
+        self.help = {}  # name -> (type, help text)
+        self.buckets = {}  # histogram name -> upper bounds
+        self.gauges = {}  # name -> callback returning [(labels dict, value)]
+        self.local = threading.local()
+        self.shards = []  # (thread, _Shard) for every thread that has recorded
+        self.retired = _Shard()  # Totals from threads that have exited
+        self.lock = threading.Lock()
+        self.sweep_at = 64
+
+    def counter(self, name, help):
+        self.help[name] = ("counter", help)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        self.help[name] = ("histogram", help)
+        self.buckets[name] = tuple(buckets)
+
+    def gauge(self, name, help, collect):
+        self.help[name] = ("gauge", help)
+        self.gauges[name] = collect
+
+    def _shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = _Shard()
+            with self.lock:
+                self.shards.append((threading.current_thread(), shard))
+                # Threaded servers may use a thread per request, so fold finished ones regularly
+                if len(self.shards) >= self.sweep_at:
+                    self._retire_finished()
+                    self.sweep_at = max(64, 2 * len(self.shards))
+        return shard
+
+    def _retire_finished(self):
+        """Merge shards of exited threads into the retired totals; call with lock held."""
+        alive = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self.retired.merge(shard)
+        self.shards = alive
+
+    def inc(self, name, amount=1, **labels):
+        counters = self._shard().counters
+        key = (name, tuple(labels.items()))
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        histograms = self._shard().histograms
+        key = (name, tuple(labels.items()))
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(self.buckets[name]) + 2)
+        values[bisect.bisect_left(self.buckets[name], value)] += 1
+        values[-1] += value
+
+    def collect(self):
+        """Totals across all threads as a single _Shard."""
+        total = _Shard()
+        with self.lock:
+            self._retire_finished()
+            total.merge(self.retired)
+            shards = [shard for _, shard in self.shards]
+        for shard in shards:
+            total.merge(shard)
+        return total
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        total = self.collect()
+        samples = {name: [] for name in self.help}
+        for (name, labels), value in sorted(total.counters.items()):
+            samples[name].append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), values in sorted(total.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets[name] + ("+Inf",), values):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                samples[name].append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            samples[name].append(f"{name}_sum{_labels(labels)} {_number(values[-1])}")
+            samples[name].append(f"{name}_count{_labels(labels)} {cumulative}")
+        for name, collect in self.gauges.items():
+            for labels, value in collect():
+                samples[name].append(f"{name}{_labels(tuple(labels.items()))} {_number(value)}")
+
+        lines = []
+        for name, (kind, help) in self.help.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples[name])
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
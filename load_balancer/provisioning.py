@@ -0,0 +1,230 @@
+"""Backend drivers and scale jobs for /add and /rm.
+
+A driver knows how to start, stop and address one backend server. The load
+balancer runs driver calls in a worker pool and tracks each /add or /rm as a
+ScaleJob that can be polled through /jobs/<job_id>.
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from structured_log import log
+
+
+class DockerDriver:
+    """Backends are `server` containers on the compose network, reached on port 5000."""
+
+    def start(self, hostname):
+        cmd = f"docker run --name {hostname} --network load_balancer_net1 --network-alias {hostname} -e NODE_ID={hostname} -d server"
+        log.debug("Spawning server", cmd=cmd)
+        result = os.popen(cmd).read().strip()
+        log.debug("Docker result", result=result)
+        return bool(result)
+
+    def stop(self, hostname, url=None):
+        return os.system(f'docker stop {hostname} && docker rm {hostname}') == 0
+
+    def adopt(self, hostname):
+        """Existing containers are started by docker-compose, so there is nothing to do."""
+        return True
+
+    def attach(self, hostname, url):
+        """Containers outlive the load balancer, so a restarted one can use them as they are."""
+
+    def url(self, hostname):
+        return f'http://{hostname}:5000'
+
+
+STOP_TIMEOUT = 10  # seconds a local server started elsewhere has to exit after SIGTERM
+
+
+def _server_pids(port, hostname):
+    """Pids of the local server for hostname listening on port, found through /proc (Linux only).
+
+    Only processes started with SERVER_ID=hostname count, so a port that has
+    since been taken by something else is never signalled.
+    """
+    sockets = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                next(f)  # Header
+                for line in f:
+                    fields = line.split()
+                    # local address as HEX_IP:HEX_PORT, state 0A is LISTEN
+                    if fields[3] == "0A" and int(fields[1].rsplit(':', 1)[1], 16) == port:
+                        sockets.add(f"socket:[{fields[9]}]")
+        except FileNotFoundError:
+            continue
+    if not sockets:
+        return set()
+
+    pids = set()
+    server_id = f"SERVER_ID={hostname}".encode()
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            fd_dir = f"/proc/{pid}/fd"
+            if not any(os.readlink(os.path.join(fd_dir, fd)) in sockets for fd in os.listdir(fd_dir)):
+                continue
+            with open(f"/proc/{pid}/environ", "rb") as f:
+                if server_id in f.read().split(b"\0"):
+                    pids.add(int(pid))
+        except OSError:
+            continue  # Exited meanwhile, or not ours to inspect
+    return pids
+
+
+class LocalProcessDriver:
+    """Backends are server/server.py subprocesses on consecutive local ports.
+
+    Lets the full /add, /rm and routing path run without docker, e.g. in tests.
+    """
+
+    def __init__(self, base_port=None, server_script=None):
+        # workers.py gives each worker its own range so their servers never share a port
+        self.base_port = base_port if base_port is not None else int(os.getenv("LOCAL_BASE_PORT", "18000"))
+        self.server_script = server_script or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'server.py')
+        self.processes = {}  # hostname -> subprocess.Popen
+        self.ports = {}  # hostname -> port
+        self.next_port = self.base_port
+        self.lock = threading.Lock()
+
+    def start(self, hostname):
+        with self.lock:
+            if hostname in self.processes:
+                return False
+            port = self.ports.setdefault(hostname, self.next_port)
+            if port == self.next_port:
+                self.next_port += 1
+            env = dict(os.environ, SERVER_ID=hostname, PORT=str(port))
+            self.processes[hostname] = subprocess.Popen(
+                [sys.executable, self.server_script], env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        log.debug("Started local server", hostname=hostname, port=port)
+        return True
+
+    def stop(self, hostname, url=None):
+        """Stop a server, returning whether it is no longer running.
+
+        Servers started by another worker, or by an earlier load balancer, are
+        not children of this process, so they are found by the port in their
+        URL instead and signalled directly.
+        """
+        with self.lock:
+            process = self.processes.pop(hostname, None)
+            port = self.ports.get(hostname)
+        if process is not None:
+            process.terminate()
+            process.wait()
+            return True
+
+        if url:
+            port = int(url.rsplit(':', 1)[1])
+        if port is None or not os.path.exists("/proc/net/tcp"):
+            log.error("Cannot find local server to stop", hostname=hostname, port=port)
+            return False
+        pids = _server_pids(port, hostname)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while pids and time.monotonic() < deadline:
+            time.sleep(0.05)
+            pids = _server_pids(port, hostname)
+        if pids:
+            log.error("Local server did not stop", hostname=hostname, port=port, pids=sorted(pids))
+            return False
+        log.debug("Stopped local server started elsewhere", hostname=hostname, port=port)
+        return True
+
+    def adopt(self, hostname):
+        """Start the process for a server that is registered at boot, once it accepts connections."""
+        if hostname in self.processes:
+            return True
+        if self.start(hostname) and self._wait_listening(hostname):
+            return True
+        self.stop(hostname)
+        return False
+
+    def _wait_listening(self, hostname, timeout=10):
+        """Wait until a just-started server accepts connections, giving up if its process exits."""
+        process, port = self.processes[hostname], self.ports[hostname]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                return True
+            except OSError:
+                time.sleep(0.05)
+        return False
+
+    def attach(self, hostname, url):
+        """Take over a server left running by a previous load balancer, keeping new ones off its port."""
+        port = int(url.rsplit(':', 1)[1])
+        with self.lock:
+            self.ports[hostname] = port
+            self.next_port = max(self.next_port, port + 1)
+
+    def url(self, hostname):
+        return f'http://127.0.0.1:{self.ports[hostname]}'
+
+    def stop_all(self):
+        for hostname in list(self.processes):
+            self.stop(hostname)
+
+
+DRIVERS = {
+    "docker": DockerDriver,
+    "local": LocalProcessDriver,
+}
+
+
+class ScaleJob:
+    """Progress of one /add or /rm request."""
+
+    def __init__(self, operation, hostnames):
+        self.id = uuid.uuid4().hex[:12]
+        self.operation = operation
+        self.hostnames = hostnames
+        self.succeeded = []
+        self.failed = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        if not hostnames:
+            self.finished_at = self.created_at
+            self.done.set()
+
+    def record(self, hostname, ok):
+        with self.lock:
+            (self.succeeded if ok else self.failed).append(hostname)
+            if len(self.succeeded) + len(self.failed) == len(self.hostnames):
+                self.finished_at = time.time()
+                self.done.set()
+
+    @property
+    def status(self):
+        if not self.done.is_set():
+            return "running"
+        return "failed" if self.failed and not self.succeeded else "completed"
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "hostnames": self.hostnames,
+            "succeeded": list(self.succeeded),
+            "failed": list(self.failed),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
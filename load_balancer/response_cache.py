@@ -0,0 +1,132 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*(s-maxage|max-age)\s*=\s*\"?(\d+)\"?", re.IGNORECASE)
+_NO_STORE = re.compile(r"(?:^|,)\s*(no-store|no-cache|private)\b", re.IGNORECASE)
+
+
+def cache_ttl(cache_control, default_ttl):
+    """Seconds a response may be served from cache, from its Cache-Control header.
+
+    s-maxage wins over max-age since the load balancer is a shared cache;
+    responses without either directive get default_ttl.
+    """
+    if not cache_control:
+        return default_ttl
+    if _NO_STORE.search(cache_control):
+        return 0
+    ages = dict((name.lower(), int(value)) for name, value in _MAX_AGE.findall(cache_control))
+    return ages.get("s-maxage", ages.get("max-age", default_ttl))
+
+
+class CachedResponse:
+    __slots__ = ("body", "status", "node_id", "expires_at", "size")
+
+    def __init__(self, body, status, node_id, expires_at, size):
+        self.body = body
+        self.status = status
+        self.node_id = node_id
+        self.expires_at = expires_at
+        self.size = size
+
+
+class ResponseCache:
+    """TTL + LRU cache of upstream responses, keyed by (method, path, routing key).
+
+    Each entry remembers the node that produced it, so everything a node served
+    can be dropped when it leaves the ring. Memory is capped by both entry
+    count and total body size; the least recently used entries go first.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, default_ttl=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()  # key -> CachedResponse, least recently used first
+        self.node_keys = {}  # node_id -> set of keys it served
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, now=None):
+        """The cached (body, status) for key, or None on a miss."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= now:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.body, entry.status
+
+    def put(self, key, node_id, body, status, cache_control=None, now=None):
+        """Store a response if its Cache-Control allows it, returning whether it was stored."""
+        ttl = cache_ttl(cache_control, self.default_ttl)
+        size = len(body)
+        if ttl <= 0 or size > self.max_bytes:
+            return False
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = CachedResponse(body, status, node_id, now + ttl, size)
+            self.node_keys.setdefault(node_id, set()).add(key)
+            self.bytes += size
+            self.stores += 1
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+        return True
+
+    def _drop(self, key):
+        """Remove one entry; call with lock held."""
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+        keys = self.node_keys.get(entry.node_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.node_keys[entry.node_id]
+
+    def invalidate_node(self, node_id):
+        """Drop every entry served by node_id, returning how many there were."""
+        with self.lock:
+            keys = self.node_keys.pop(node_id, set())
+            for key in keys:
+                entry = self.entries.pop(key)
+                self.bytes -= entry.size
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.node_keys.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,48 @@
+class RingSnapshot:
+    """One immutable version of the load balancer's membership.
+
+    The hash ring and the hostname maps are published together, so a request
+    that reads `lb.snapshot` once sees a ring whose node ids all resolve to
+    hostnames, no matter what /add, /rm or the health checker do meanwhile.
+    Writers copy() the current snapshot, change the copy and publish it as a
+    new version; published snapshots are never modified.
+    """
+
+    def __init__(self, hash_ring, servers=None, node_to_hostname=None, weights=None, version=0, urls=None):
+        self.hash_ring = hash_ring
+        self.servers = servers if servers is not None else {}  # hostname -> node_id
+        self.node_to_hostname = node_to_hostname if node_to_hostname is not None else {}  # node_id -> hostname
+        self.weights = weights if weights is not None else {}  # hostname -> capacity weight
+        self.urls = urls if urls is not None else {}  # hostname -> base URL
+        self.version = version
+
+    def copy(self):
+        """Mutable draft of the next version."""
+        return RingSnapshot(self.hash_ring.copy(), dict(self.servers), dict(self.node_to_hostname),
+                            dict(self.weights), self.version + 1, dict(self.urls))
+
+    def to_dict(self, next_node_id):
+        """JSON-serialisable membership; the ring itself is rebuilt from it by from_dict()."""
+        return {
+            "version": self.version,
+            "next_node_id": next_node_id,
+            "servers": self.servers,
+            "weights": self.weights,
+            "urls": self.urls,
+            "ring_nodes": sorted(self.hash_ring.get_nodes())  # Ejected servers stay registered but off the ring
+        }
+
+    @classmethod
+    def from_dict(cls, state, hash_ring):
+        """Snapshot for state from to_dict(), placing its ring nodes on the empty engine hash_ring.
+
+        Node positions depend only on node ids and weights, so the rebuilt ring
+        routes every key exactly like the one that was serialised. The nodes go
+        in with one add_nodes() call, so Maglev builds its table once, not once
+        per node.
+        """
+        servers = state["servers"]
+        node_to_hostname = {node_id: hostname for hostname, node_id in servers.items()}
+        hash_ring.add_nodes({node_id: state["weights"][node_to_hostname[node_id]] for node_id in state["ring_nodes"]})
+        return cls(hash_ring, dict(servers), node_to_hostname, dict(state["weights"]), state["version"],
+                   dict(state["urls"]))
@@ -0,0 +1,81 @@
+"""On-disk ring snapshot for warm restarts.
+
+Every published membership change is saved to RING_SNAPSHOT_PATH in a compact
+binary file: a header, then one record per registered server with its node
+id, weight, URL and, for the ring engine, its virtual server positions as a
+uint64 array. On boot the file is memory-mapped and read back, so servers keep
+their node ids and ring positions and key ownership is exactly what it was
+before the restart.
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from consistent_hash import HashRing
+
+MAGIC = b"LBRING01"
+HEADER = struct.Struct("<8sQQII")  # magic, ring version, next node id, server count, engine name length
+RECORD = struct.Struct("<qd?HHI")  # node id, weight, on ring, hostname length, URL length, position count
+
+
+def save(path, snapshot, next_node_id, engine):
+    """Write snapshot to path atomically, so a crash mid-write leaves the previous file intact."""
+    engine_name = engine.encode()
+    parts = [HEADER.pack(MAGIC, snapshot.version, next_node_id, len(snapshot.servers), len(engine_name)), engine_name]
+    ring_positions = snapshot.hash_ring.node_positions if isinstance(snapshot.hash_ring, HashRing) else {}
+    on_ring = set(snapshot.hash_ring.get_nodes())
+    for hostname, node_id in snapshot.servers.items():
+        host = hostname.encode()
+        url = snapshot.urls.get(hostname, "").encode()
+        positions = np.array(ring_positions.get(node_id, []), dtype=np.uint64)
+        parts += [RECORD.pack(node_id, snapshot.weights[hostname], node_id in on_ring, len(host), len(url),
+                              len(positions)), host, url, positions.tobytes()]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(parts))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load(path):
+    """Saved state as a dict, or None if there is no snapshot.
+
+    Raises ValueError if the file is not a ring snapshot or is truncated.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < HEADER.size:
+            raise ValueError(f"Ring snapshot {path} is truncated")
+        magic, version, next_node_id, count, engine_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a ring snapshot")
+        offset = HEADER.size
+        engine = data[offset:offset + engine_length].decode()
+        offset += engine_length
+
+        servers = []
+        for _ in range(count):
+            if offset + RECORD.size > len(data):
+                raise ValueError(f"Ring snapshot {path} is truncated")
+            node_id, weight, on_ring, host_length, url_length, position_count = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            hostname = data[offset:offset + host_length].decode()
+            offset += host_length
+            url = data[offset:offset + url_length].decode()
+            offset += url_length
+            end = offset + position_count * 8
+            if end > len(data):
+                raise ValueError(f"Ring snapshot {path} is truncated")
+            positions = np.frombuffer(data, dtype=np.uint64, count=position_count, offset=offset).tolist()
+            offset = end
+            servers.append({"hostname": hostname, "node_id": node_id, "weight": weight, "on_ring": on_ring,
+                            "url": url, "positions": positions})
+
+    return {"version": version, "next_node_id": next_node_id, "engine": engine, "servers": servers}
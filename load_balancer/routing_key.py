@@ -0,0 +1,53 @@
+import random
+
+DEFAULT_ROUTING_KEY = "header:X-Request-Key,cookie:session,random"
+
+
+class RoutingKeyExtractor:
+    """Pick the key a request is hashed by from an ordered list of sources.
+
+    The spec is a comma-separated list tried left to right, e.g.
+    "header:X-Request-Key,cookie:session,ip,random". Supported sources:
+    header:<name>, cookie:<name>, query:<name>, path, path:<index>, ip and
+    random. "random" always yields a key, so it only makes sense last.
+    """
+
+    def __init__(self, spec=DEFAULT_ROUTING_KEY):
+        self.sources = []
+        for source in spec.split(','):
+            kind, _, name = source.strip().partition(':')
+            if kind not in ('header', 'cookie', 'query', 'path', 'ip', 'random'):
+                raise ValueError(f"Unknown routing key source: {source}")
+            if kind in ('header', 'cookie', 'query') and not name:
+                raise ValueError(f"Routing key source {kind} needs a name, e.g. {kind}:session")
+            if kind == 'path' and name and not name.lstrip('-').isdigit():
+                raise ValueError(f"Routing key source {source} needs a segment index, e.g. path:0")
+            self.sources.append((kind, name))
+
+    def extract(self, headers, cookies, query, path, client_ip):
+        """Return (key, source) for the first source present in the request, or (None, None)"""
+        for kind, name in self.sources:
+            if kind == 'header':
+                key = headers.get(name)
+            elif kind == 'cookie':
+                key = cookies.get(name)
+            elif kind == 'query':
+                key = query.get(name)
+            elif kind == 'path':
+                key = self._path_component(path, name)
+            elif kind == 'ip':
+                key = client_ip
+            else:
+                key = str(random.randint(100000, 999999))
+
+            if key:
+                return key, f"{kind}:{name}" if name else kind
+        return None, None
+
+    def _path_component(self, path, index):
+        """The whole path, or one '/'-separated segment of it when an index is given"""
+        if not index:
+            return path
+        segments = [segment for segment in path.split('/') if segment]
+        position = int(index)
+        return segments[position] if -len(segments) <= position < len(segments) else None
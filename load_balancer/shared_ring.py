@@ -0,0 +1,142 @@
+"""Ring membership shared by load balancer worker processes.
+
+workers.py runs several load balancer processes behind one port. They share
+a multiprocessing.shared_memory segment that holds a version counter followed
+by the latest published RingSnapshot, encoded as JSON. Readers compare the
+counter with their own snapshot's version on every request, which costs one
+8-byte read, and rebuild their ring only when another worker has published.
+Writers serialise on a file lock next to the segment. SharedStatus keeps
+scale jobs and health probe results in a second segment of the same kind.
+"""
+import fcntl
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+HEADER = struct.Struct("<QQ")  # sequence, payload length
+DEFAULT_SIZE = 4 * 1024 * 1024  # bytes, enough for tens of thousands of servers
+STATUS_SIZE = 1024 * 1024  # bytes, enough for the kept scale jobs and a health record per server
+
+
+class SharedRing:
+    """Seqlock-protected JSON membership in a shared memory segment.
+
+    The sequence is odd while a write is in progress and even otherwise, and
+    the published snapshot version is sequence // 2. A reader retries until
+    it sees the same even sequence before and after copying the payload.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{shm.name.lstrip('/')}.lock")
+        self.lock_file = open(self.lock_path, "a")
+
+    @classmethod
+    def create(cls, size=DEFAULT_SIZE):
+        """New, empty segment; its creator unlinks it."""
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        HEADER.pack_into(shm.buf, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Open a segment made by create() in a parent process.
+
+        Spawned workers share their parent's resource tracker, so the segment
+        lives until the parent unlinks it, whichever workers exit first.
+        """
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def version(self):
+        """Version of the latest published snapshot (0 before the first write)."""
+        return HEADER.unpack_from(self.shm.buf, 0)[0] // 2
+
+    def read(self):
+        """The latest published state, or None before the first write."""
+        while True:
+            sequence, length = HEADER.unpack_from(self.shm.buf, 0)
+            if sequence % 2:
+                time.sleep(0)  # A writer is halfway through; let it finish
+                continue
+            payload = bytes(self.shm.buf[HEADER.size:HEADER.size + length])
+            if HEADER.unpack_from(self.shm.buf, 0)[0] == sequence:
+                return json.loads(payload) if sequence else None
+
+    def write(self, version, state):
+        """Publish state as the given version; call with locked() held."""
+        payload = json.dumps(state, separators=(",", ":")).encode()
+        if HEADER.size + len(payload) > self.shm.size:
+            raise ValueError(f"Ring state of {len(payload)} bytes does not fit in the shared segment")
+        sequence = HEADER.unpack_from(self.shm.buf, 0)[0]
+        HEADER.pack_into(self.shm.buf, 0, sequence + 1, 0)
+        self.shm.buf[HEADER.size:HEADER.size + len(payload)] = payload
+        HEADER.pack_into(self.shm.buf, 0, version * 2, len(payload))
+
+    @contextmanager
+    def locked(self):
+        """Hold the cross-process writer lock."""
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        self.lock_file.close()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            try:
+                os.remove(self.lock_path)
+            except FileNotFoundError:
+                pass
+
+
+class SharedStatus:
+    """Scale jobs and health probe results that every worker can report.
+
+    SO_REUSEPORT hands GET /jobs/<id> and /rep to any worker, so the worker
+    running a scale job, and worker 0's health checker, publish what they know
+    here. It has its own segment so that these frequent updates don't bump
+    the ring version.
+    """
+
+    def __init__(self, segment):
+        self.segment = segment
+        self.lock = threading.Lock()  # The file lock doesn't exclude other threads of this process
+
+    @classmethod
+    def create(cls, size=STATUS_SIZE):
+        return cls(SharedRing.create(size))
+
+    @classmethod
+    def attach(cls, name):
+        return cls(SharedRing.attach(name))
+
+    @property
+    def name(self):
+        return self.segment.name
+
+    def read(self):
+        """{"jobs": job_id -> job dict, oldest first, "health": hostname -> probe record}"""
+        return self.segment.read() or {"jobs": {}, "health": {}}
+
+    def update(self, change):
+        """Apply change(state) to the latest state and publish it, holding the writer lock throughout."""
+        with self.lock, self.segment.locked():
+            state = self.read()
+            change(state)
+            self.segment.write(self.segment.version() + 1, state)
+
+    def close(self):
+        self.segment.close()
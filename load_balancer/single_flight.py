@@ -0,0 +1,83 @@
+"""Request coalescing: concurrent identical calls share one execution.
+
+The first caller for a key (the leader) runs the call; callers that arrive
+with the same key while it is running wait for it and get the same result or
+exception. Nothing is remembered once the call finishes, so this only merges
+overlapping requests and never serves stale data.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalescing for threaded callers, such as Flask request threads."""
+
+    def __init__(self):
+        self.calls = {}  # key -> _Call in progress
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Return (fn(), shared), where shared is True if another caller's result was reused."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """Coalescing for coroutines on one event loop."""
+
+    def __init__(self):
+        self.calls = {}  # key -> asyncio.Task running the call
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """Return (await fn(), shared), where shared is True if another caller's result was reused."""
+        task = self.calls.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            # The call runs in its own task, so it outlives the leader's request being cancelled
+            task = self.calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        # shield: any caller being cancelled, leader included, must not cancel the call for everyone else
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved, so a call nobody waited on isn't logged as unhandled
@@ -0,0 +1,113 @@
+"""Balancing strategies for routes that don't need key affinity.
+
+The hash ring stays the default; these spread stateless requests (like /home)
+by live backend load instead. Each strategy's choose() returns up to `count`
+node ids in the order they should be tried, so failover still works.
+"""
+import math
+import random
+import threading
+import time
+
+
+class PeakEwma:
+    """Peak-sensitive exponentially weighted moving average of upstream latency per node.
+
+    A slower-than-average response replaces the average outright, while faster
+    ones decay it with time constant `decay` seconds, so a backend that starts
+    stalling is penalised immediately and forgiven gradually.
+    """
+
+    def __init__(self, decay=10.0):
+        self.decay = decay
+        self.values = {}  # node -> (ewma seconds, monotonic time of last update)
+        self.lock = threading.Lock()
+
+    def observe(self, node, latency, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            ewma, last = self.values.get(node, (latency, now))
+            if latency > ewma:
+                ewma = latency
+            else:
+                weight = math.exp(-(now - last) / self.decay)
+                ewma = ewma * weight + latency * (1 - weight)
+            self.values[node] = (ewma, now)
+
+    def get(self, node):
+        return self.values.get(node, (0.0, 0.0))[0]
+
+    def forget(self, node):
+        with self.lock:
+            self.values.pop(node, None)
+
+
+def _with_fallbacks(first, nodes, cost, count):
+    """`first`, then the cheapest remaining nodes, up to count in total."""
+    rest = sorted((node for node in nodes if node != first), key=cost)
+    return [first] + rest[:count - 1]
+
+
+def _two_choices(nodes, cost):
+    """Sample two distinct nodes and keep the cheaper one."""
+    if len(nodes) == 1:
+        return nodes[0]
+    a, b = random.sample(nodes, 2)
+    return a if cost(a) <= cost(b) else b
+
+
+class PowerOfTwoChoices:
+    """Pick two random nodes and send to the one with fewer requests in flight."""
+
+    def choose(self, nodes, in_flight, latency, count):
+        cost = lambda node: in_flight.get(node, 0)
+        return _with_fallbacks(_two_choices(nodes, cost), nodes, cost, count)
+
+
+class LeastOutstandingRequests:
+    """Send to the node with the fewest requests in flight, breaking ties at random."""
+
+    def choose(self, nodes, in_flight, latency, count):
+        shuffled = random.sample(nodes, len(nodes))
+        return sorted(shuffled, key=lambda node: in_flight.get(node, 0))[:count]
+
+
+class PeakEwmaStrategy:
+    """Power of two choices on peak-EWMA latency × (in-flight + 1).
+
+    Nodes with no latency samples yet cost 0, so new backends get probed quickly.
+    """
+
+    def choose(self, nodes, in_flight, latency, count):
+        cost = lambda node: latency.get(node) * (in_flight.get(node, 0) + 1)
+        return _with_fallbacks(_two_choices(nodes, cost), nodes, cost, count)
+
+
+STRATEGIES = {
+    "p2c": PowerOfTwoChoices(),
+    "least_outstanding": LeastOutstandingRequests(),
+    "peak_ewma": PeakEwmaStrategy(),
+}
+
+
+def parse_route_strategies(spec):
+    """Parse "prefix=strategy,..." into (prefix, strategy) pairs, longest prefix first.
+
+    "ring" is accepted alongside the STRATEGIES names and means consistent hashing.
+    """
+    routes = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        prefix, _, name = entry.partition('=')
+        if name != "ring" and name not in STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy for {prefix}: {name}")
+        routes.append(('/' + prefix.strip().lstrip('/'), name))
+    return sorted(routes, key=lambda route: len(route[0]), reverse=True)
+
+
+def strategy_for_path(routes, path, default="ring"):
+    """Name of the strategy whose prefix matches the request path."""
+    path = '/' + path.lstrip('/')
+    for prefix, name in routes:
+        if path.startswith(prefix):
+            return name
+    return default
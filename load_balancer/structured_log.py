@@ -0,0 +1,119 @@
+"""JSON-lines logging for the load balancer, written off the request path.
+
+Callers hand a dict of fields to a queue and return; a background thread
+serialises the records and writes them to stdout in batches. Access logs are
+sampled with ACCESS_LOG_SAMPLE_RATE (0 turns them off), and records below
+LOG_LEVEL are dropped before they are queued; hot paths check enabled()
+first so their fields aren't even built. If the writer falls behind,
+records are dropped and counted rather than blocking requests.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+LEVELS = {"debug": 10, "info": 20, "warn": 30, "error": 40}
+
+
+class StructuredLog:
+    def __init__(self, stream=None, level="info", sample_rate=1.0,
+                 batch_size=256, flush_interval=0.5, max_queue=100000):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level: {level}")
+        self.stream = stream or sys.stdout
+        self.level = LEVELS[level]
+        self.sample_rate = sample_rate
+        self.access_enabled = sample_rate > 0 and self.level <= LEVELS["info"]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.writer = None
+        self.writer_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(level=os.getenv("LOG_LEVEL", "info").lower(),
+                   sample_rate=float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0")))
+
+    def _enqueue(self, record):
+        if self.writer is None:
+            self._start_writer()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_writer(self):
+        with self.writer_lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self.writer.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            lines = [json.dumps(record, default=str, ensure_ascii=False) for record in batch]
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception as e:
+            sys.stderr.write(f"log writer failed, dropped {len(batch)} records: {e}\n")
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def log(self, level, msg, **fields):
+        """Queue an event record if level is at or above LOG_LEVEL."""
+        if LEVELS[level] < self.level:
+            return
+        self._enqueue({"ts": time.time(), "level": level, "msg": msg, **fields})
+
+    def debug(self, msg, **fields):
+        self.log("debug", msg, **fields)
+
+    def info(self, msg, **fields):
+        self.log("info", msg, **fields)
+
+    def warn(self, msg, **fields):
+        self.log("warn", msg, **fields)
+
+    def error(self, msg, **fields):
+        self.log("error", msg, **fields)
+
+    def enabled(self, level):
+        """Whether records at level are kept; check before building fields on a hot path."""
+        return LEVELS[level] >= self.level
+
+    def sampled(self):
+        """Whether to log this request; check before building an access record."""
+        return self.access_enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def access(self, **fields):
+        """Queue an access record; callers should check sampled() first."""
+        self._enqueue({"ts": time.time(), "level": "info", "msg": "access", **fields})
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        if self.writer is not None:
+            self.queue.join()
+
+
+log = StructuredLog.from_env()
+atexit.register(log.flush)  # Don't lose the last batch on shutdown
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+
+# No health probes against the placeholder Server1-3, and only warnings on stdout
+os.environ.setdefault("HEALTH_CHECK_INTERVAL", "0")
+os.environ.setdefault("LOG_LEVEL", "warn")
+
+import load_balancer
+import ring_store
+from load_balancer import ROUTE_ATTEMPTS, LoadBalancer, RoutingError
+from health import HealthChecker
+from provisioning import DRIVERS
+from response_cache import ResponseCache, cache_ttl
+from routing_key import RoutingKeyExtractor
+from shared_ring import SharedRing
+from single_flight import AsyncSingleFlight
+from strategies import parse_route_strategies
+
+def test_routing_during_membership_churn():
+    """Test that select_servers never sees a half-applied /add or /rm while membership churns"""
+    print("\n=== Testing Routing During Membership Churn ===")
+    lb = LoadBalancer()  # Docker driver: registering Server1-3 runs no commands
+    lb.route_strategies = parse_route_strategies("/p2c=p2c")
+    stop = threading.Event()
+    errors = []
+    routed = [0]
+
+    def churn():
+        for i in range(300):
+            hostnames = list(lb.servers)
+            if len(hostnames) > 2 and i % 2:
+                assert lb._deregister_server(random.choice(hostnames)) is not None
+            else:
+                assert lb._register_node(f"churn-{i}", weight=random.choice([0.5, 1.0, 2.0])) is not None
+        stop.set()
+
+    def route():
+        rng = random.Random()
+        while not stop.is_set():
+            try:
+                path = rng.choice(["home", "p2c/home"])
+                headers = {"X-Request-Key": f"user-{rng.randrange(1000)}"}
+                hostnames, _ = lb.select_servers(headers, {}, {}, path, "127.0.0.1")
+                assert hostnames and len(set(hostnames)) == len(hostnames) <= ROUTE_ATTEMPTS
+                routed[0] += 1
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+    threads = [threading.Thread(target=route) for _ in range(4)] + [threading.Thread(target=churn)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    assert lb.snapshot.version == 300 + 3
+    assert set(lb.node_to_hostname) == set(lb.hash_ring.get_nodes())
+    print(f"{routed[0]} requests routed across 300 membership changes, final servers: {len(lb.servers)}")
+
+def test_shared_ring_sync_speed():
+    """Test that a worker adopts a 100-node Maglev membership from the shared ring with one table build"""
+    print("\n=== Testing Shared Ring Sync ===")
+    num_servers = 100
+    hostnames = [f"server-{i}" for i in range(num_servers)]
+    state = {
+        "version": 10,
+        "next_node_id": num_servers,
+        "servers": {hostname: node_id for node_id, hostname in enumerate(hostnames)},
+        "weights": {hostname: 2.0 if node_id % 10 == 0 else 1.0 for node_id, hostname in enumerate(hostnames)},
+        "urls": {hostname: f"http://{hostname}:5000" for hostname in hostnames},
+        "ring_nodes": list(range(num_servers - 1))  # The last server was ejected
+    }
+    shared = SharedRing.create()
+    lb = LoadBalancer()
+    engine = load_balancer.LOOKUP_ENGINE
+    try:
+        shared.write(state["version"], state)
+        load_balancer.LOOKUP_ENGINE = "maglev"
+        lb.shared_ring = SharedRing.attach(shared.name)
+        start = time.perf_counter()
+        snapshot = lb._sync()
+        elapsed = time.perf_counter() - start
+    finally:
+        load_balancer.LOOKUP_ENGINE = engine
+        if lb.shared_ring is not None:
+            lb.shared_ring.close()
+        lb.shared_ring = None
+        shared.close()
+
+    assert snapshot.version == 10 and len(snapshot.servers) == num_servers
+    assert sorted(snapshot.hash_ring.get_nodes()) == list(range(num_servers - 1))
+    assert snapshot.hash_ring.node_weights[0] == 2.0
+    print(f"Synced {num_servers} Maglev nodes in {elapsed * 1000:.0f} ms")
+    assert elapsed < 1.0  # One build takes ~50 ms; a build per node took seconds
+
+class StubDriver:
+    """Driver for servers that exist only on paper; its heartbeat answers for the hostnames in `alive`."""
+    alive = set()
+
+    def __init__(self):
+        self.attached = {}
+
+    def adopt(self, hostname):
+        return True
+
+    def attach(self, hostname, url):
+        self.attached[hostname] = url
+
+    def url(self, hostname):
+        return f"http://{hostname}:5000"
+
+    @classmethod
+    def answers_heartbeat(cls, url):
+        return url.split("//")[1].split(":")[0] in cls.alive
+
+def test_ring_store_round_trip():
+    """Test that ring_store saves and loads every server, and rejects files that are truncated or not snapshots"""
+    print("\n=== Testing Ring Store ===")
+    lb = LoadBalancer()
+    lb._register_node("Server4", weight=2.5)
+    lb._eject_server("Server2")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ring.bin")
+        assert ring_store.load(path) is None
+        ring_store.save(path, lb.snapshot, lb.next_node_id, "ring")
+        state = ring_store.load(path)
+        assert (state["version"], state["next_node_id"], state["engine"]) == (lb.snapshot.version, 4, "ring")
+        servers = {server["hostname"]: server for server in state["servers"]}
+        assert set(servers) == {"Server1", "Server2", "Server3", "Server4"}
+        for hostname, server in servers.items():
+            node_id = lb.servers[hostname]
+            assert server["node_id"] == node_id
+            assert server["weight"] == lb.weights[hostname]
+            assert server["url"] == lb.snapshot.urls[hostname]
+            assert server["on_ring"] == (hostname != "Server2")
+            assert server["positions"] == list(lb.hash_ring.node_positions.get(node_id, []))
+        assert len(servers["Server4"]["positions"]) > len(servers["Server1"]["positions"]) > 0
+
+        with open(path, "rb") as f:
+            data = f.read()
+        for size in (ring_store.HEADER.size - 1, ring_store.HEADER.size + len("ring") + 1, len(data) - 8):
+            with open(path, "wb") as f:
+                f.write(data[:size])
+            try:
+                ring_store.load(path)
+                assert False, f"Truncated to {size} bytes but loaded"
+            except ValueError as e:
+                assert "truncated" in str(e)
+
+        with open(path, "wb") as f:
+            f.write(b"NOTARING" + data[8:])
+        try:
+            ring_store.load(path)
+            assert False, "Loaded a file with the wrong magic"
+        except ValueError as e:
+            assert "not a ring snapshot" in str(e)
+    print(f"Round-tripped {len(servers)} servers; truncated and foreign files raise ValueError")
+
+def test_warm_start_reconciliation():
+    """Test that a warm start drops dead servers, keeps live ones in place and leaves ejected ones off the ring"""
+    print("\n=== Testing Warm Start ===")
+    answers_heartbeat = LoadBalancer._answers_heartbeat
+    driver = os.environ.get("LB_DRIVER")
+    with tempfile.TemporaryDirectory() as tmp:
+        load_balancer.RING_SNAPSHOT_PATH = os.path.join(tmp, "ring.bin")
+        DRIVERS["stub"] = StubDriver
+        os.environ["LB_DRIVER"] = "stub"
+        LoadBalancer._answers_heartbeat = StubDriver.answers_heartbeat
+        try:
+            # Nothing saved yet: the initial servers are registered, and every change is saved
+            before = LoadBalancer()
+            for i in range(4, 7):
+                before._register_node(f"Server{i}", weight=1.0 + i % 2)
+            before._deregister_server("Server6")  # node id 5 is gone for good
+            before._eject_server("Server3")
+            saved = before.snapshot
+
+            StubDriver.alive = {"Server1", "Server3", "Server4"}  # Server2 and Server5 died during the restart
+            after = LoadBalancer()
+        finally:
+            load_balancer.RING_SNAPSHOT_PATH = ""
+            LoadBalancer._answers_heartbeat = answers_heartbeat
+            del DRIVERS["stub"]
+            if driver is None:
+                del os.environ["LB_DRIVER"]
+            else:
+                os.environ["LB_DRIVER"] = driver
+
+    assert set(after.servers) == {"Server1", "Server3", "Server4"}
+    assert all(after.servers[hostname] == saved.servers[hostname] for hostname in after.servers)
+    assert after.weights == {hostname: saved.weights[hostname] for hostname in after.servers}
+    assert set(after.driver.attached) == set(after.servers)
+    # Live servers keep their exact ring positions; the ejected one is registered but off the ring
+    assert sorted(after.hash_ring.get_nodes()) == [saved.servers["Server1"], saved.servers["Server4"]]
+    for hostname in ("Server1", "Server4"):
+        node_id = saved.servers[hostname]
+        assert after.hash_ring.node_positions[node_id] == saved.hash_ring.node_positions[node_id]
+    assert not after.health_checker.is_healthy("Server3")
+    assert after.snapshot.version > saved.version
+
+    # Node ids of dropped and deregistered servers are never handed out again
+    assert after.next_node_id == 6
+    assert after._register_node("Server7") == 6
+
+    # The health checker puts the ejected server back once it passes its probes
+    after.health_checker._probe = lambda hostname: (True, 1.0, None)
+    for _ in range(load_balancer.HEALTH_SUCCESS_THRESHOLD):
+        after.health_checker.check_all()
+    assert saved.servers["Server3"] in after.hash_ring.get_nodes()
+    print(f"Restored {sorted(after.servers)}, next node id {after.next_node_id}")
+
+def test_response_cache_ttl():
+    """Test how Cache-Control headers map to cache lifetimes"""
+    print("\n=== Testing Response Cache TTL ===")
+    assert cache_ttl(None, 30) == 30
+    assert cache_ttl("", 30) == 30
+    assert cache_ttl("public", 30) == 30
+    assert cache_ttl("max-age=60", 30) == 60
+    assert cache_ttl("public, MAX-AGE=\"45\"", 0) == 45
+    # The load balancer is a shared cache, so s-maxage wins whichever order they come in
+    assert cache_ttl("max-age=60, s-maxage=10", 30) == 10
+    assert cache_ttl("s-maxage=10, max-age=60", 30) == 10
+    for directive in ("no-store", "no-cache", "private", "max-age=60, private", "No-Store"):
+        assert cache_ttl(directive, 30) == 0, directive
+    assert cache_ttl("max-age=0", 30) == 0
+    print("s-maxage > max-age > default TTL; no-store, no-cache and private disable caching")
+
+def test_response_cache_expiry_and_eviction():
+    """Test that cached responses expire and that the least recently used go first under either cap"""
+    print("\n=== Testing Response Cache Expiry and Eviction ===")
+    cache = ResponseCache(max_entries=3, max_bytes=100, default_ttl=10)
+    assert cache.put("a", 0, b"x" * 10, 200, now=0)
+    assert not cache.put("never", 0, b"x", 200, cache_control="no-store", now=0)
+    assert not cache.put("huge", 0, b"x" * 101, 200, now=0)
+    assert cache.put("short", 1, b"y" * 5, 200, cache_control="max-age=2", now=0)
+    assert cache.get("short", now=1.9) == (b"y" * 5, 200)
+    assert cache.get("short", now=2) is None
+    assert cache.get("a", now=9.9) == (b"x" * 10, 200)
+    assert cache.get("a", now=10) is None
+    assert (cache.expirations, cache.bytes, len(cache.entries), cache.node_keys) == (2, 0, 0, {})
+
+    # Entry count: reading "a" makes "b" the least recently used
+    for key in "abc":
+        cache.put(key, 0, b"x" * 10, 200, now=0)
+    assert cache.get("a", now=1) is not None
+    cache.put("d", 1, b"x" * 10, 200, now=1)
+    assert list(cache.entries) == ["c", "a", "d"] and cache.evictions == 1
+
+    # Total bytes: an 85-byte body pushes out the two least recently used entries
+    cache.put("big", 2, b"z" * 85, 200, now=2)
+    assert list(cache.entries) == ["d", "big"]
+    assert cache.bytes == 95 and cache.evictions == 3
+    assert cache.node_keys == {1: {"d"}, 2: {"big"}}
+
+    # Replacing a key counts its new size only
+    cache.put("d", 2, b"x" * 5, 200, now=3)
+    assert cache.bytes == 90 and cache.node_keys == {2: {"big", "d"}}
+    print(f"Stats after eviction: {cache.stats()}")
+
+def test_response_cache_invalidate_node():
+    """Test that invalidating a node drops exactly its entries and keeps the byte count and index consistent"""
+    print("\n=== Testing Response Cache Invalidation ===")
+    cache = ResponseCache(max_entries=100, max_bytes=10000, default_ttl=60)
+    for i in range(30):
+        cache.put(f"key-{i}", i % 3, b"x" * (i + 1), 200, now=0)
+    cache.get("key-4", now=1)  # Hits and LRU order don't matter to invalidation
+    assert cache.invalidate_node(1) == 10
+    assert cache.invalidate_node(1) == 0
+    assert cache.invalidate_node(99) == 0
+    assert all(entry.node_id != 1 for entry in cache.entries.values())
+    assert cache.bytes == sum(entry.size for entry in cache.entries.values())
+    assert set(cache.node_keys) == {0, 2}
+    assert set().union(*cache.node_keys.values()) == set(cache.entries)
+    assert cache.get("key-1", now=1) is None and cache.get("key-0", now=1) is not None
+    assert cache.stats()["invalidations"] == 10
+
+    # Later evictions must not trip over keys already invalidated
+    cache.max_entries = 5
+    cache.put("new", 1, b"x", 200, now=2)
+    assert len(cache.entries) == 5 and cache.bytes == sum(entry.size for entry in cache.entries.values())
+    print(f"Invalidated node 1, {len(cache.entries)} entries and {cache.bytes} bytes left")
+
+def test_health_checker_thresholds():
+    """Test that backends flip down and up only after enough consecutive probes, with one callback per flip"""
+    print("\n=== Testing Health Checker Thresholds ===")
+    backends = ["a", "b"]
+    probes = {"a": [], "b": []}  # hostname -> outcomes still to be returned, True for a passing probe
+    downs, ups, reports = [], [], []
+    checker = HealthChecker(lambda: list(backends), lambda hostname: f"http://{hostname}:5000",
+                            downs.append, ups.append, interval=0, failure_threshold=3, success_threshold=2,
+                            on_checked=reports.append)
+    checker._probe = lambda hostname: (True, 1.0, None) if probes[hostname].pop(0) else (False, None, "refused")
+
+    def check(a, b):
+        probes["a"].append(a)
+        probes["b"].append(b)
+        checker.check_all()
+
+    try:
+        # A failure streak broken by a success never reaches the threshold
+        for a in (False, False, True, False, False):
+            check(a, True)
+        assert downs == [] and checker.is_healthy("a")
+        check(False, True)
+        assert downs == ["a"] and not checker.is_healthy("a")
+        assert reports[-1]["a"]["consecutive_failures"] == 3 and reports[-1]["a"]["last_error"] == "refused"
+        for _ in range(3):
+            check(False, True)
+        assert downs == ["a"]  # Only the transition is reported
+
+        check(True, True)
+        assert ups == [] and not checker.is_healthy("a")
+        check(True, True)
+        assert ups == ["a"] and checker.is_healthy("a")
+        check(True, True)
+        assert ups == ["a"] and downs == ["a"]
+        assert checker.is_healthy("b") and checker.status["b"].consecutive_successes == 12
+
+        # Backends removed through /rm stop being tracked
+        backends.remove("b")
+        check(True, True)
+        assert set(checker.status) == {"a"} and set(reports[-1]) == {"a"}
+        assert checker.is_healthy("b")  # Unknown backends are assumed healthy
+    finally:
+        checker.stop()
+    print(f"{len(reports)} rounds: down {downs}, up {ups}")
+
+def test_routing_key_extractor():
+    """Test routing key spec parsing and the order sources are tried in"""
+    print("\n=== Testing Routing Key Extractor ===")
+    extractor = RoutingKeyExtractor("header:X-User,cookie:session,query:uid,path:1,path:-1,path,ip")
+    assert extractor.sources == [("header", "X-User"), ("cookie", "session"), ("query", "uid"),
+                                 ("path", "1"), ("path", "-1"), ("path", ""), ("ip", "")]
+
+    def extract(headers=None, cookies=None, query=None, path="", client_ip=None):
+        return extractor.extract(headers or {}, cookies or {}, query or {}, path, client_ip)
+
+    assert extract({"X-User": "alice"}, {"session": "s1"}, {"uid": "7"}) == ("alice", "header:X-User")
+    assert extract({"X-Other": "x"}, {"session": "s1"}, {"uid": "7"}) == ("s1", "cookie:session")
+    assert extract({"X-User": ""}, {}, {"uid": "7"}) == ("7", "query:uid")  # Empty values are skipped
+    assert extract(path="/users/42/orders/") == ("42", "path:1")
+    assert extract(path="users") == ("users", "path:-1")  # path:1 is out of range
+    assert extract(path="/", client_ip="10.0.0.1") == ("/", "path")
+    assert extract(client_ip="10.0.0.1") == ("10.0.0.1", "ip")
+    # Nothing matched and no random fallback: the load balancer answers 400
+    assert extract() == (None, None)
+
+    assert RoutingKeyExtractor("path:-2").extract({}, {}, {}, "a/b/c", None) == ("b", "path:-2")
+    assert RoutingKeyExtractor("path:-4").extract({}, {}, {}, "a/b/c", None) == (None, None)
+    assert RoutingKeyExtractor("path:3").extract({}, {}, {}, "a/b/c", None) == (None, None)
+
+    fallback = RoutingKeyExtractor("cookie:session, random")
+    key, source = fallback.extract({}, {}, {}, "", None)
+    assert source == "random" and 100000 <= int(key) <= 999999
+    assert fallback.extract({}, {"session": "s1"}, {}, "", None) == ("s1", "cookie:session")
+
+    for spec in ("header", "cookie:", "query", "path:x", "path:1.5", "body:id", "ip,hostname"):
+        try:
+            RoutingKeyExtractor(spec)
+            assert False, f"Accepted {spec!r}"
+        except ValueError:
+            pass
+
+    lb = LoadBalancer()
+    lb.key_extractor = RoutingKeyExtractor("header:X-User")
+    assert lb.select_servers({"X-User": "alice"}, {}, {}, "home", "127.0.0.1")[0]
+    try:
+        lb.select_servers({}, {}, {}, "home", "127.0.0.1")
+        assert False, "Routed a request without a routing key"
+    except RoutingError as e:
+        assert e.status == 400
+    print("Sources are tried in order; a request matching none of them is rejected with 400")
+
+def test_async_single_flight_cancelled_leader():
+    """Test that cancelling the leader's request leaves the shared call running for its followers"""
+    print("\n=== Testing Async Single-Flight Cancellation ===")
+
+    async def scenario():
+        single_flight = AsyncSingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await release.wait()
+            return "response"
+
+        leader = asyncio.ensure_future(single_flight.do("key", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.do("key", upstream))
+        late_follower = asyncio.ensure_future(single_flight.do("key", upstream))
+        await asyncio.sleep(0)
+
+        # aiohttp cancels a handler when its client disconnects
+        leader.cancel()
+        late_follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await follower == ("response", True)
+        assert leader.cancelled() and late_follower.cancelled()
+        assert len(calls) == 1
+        assert not single_flight.calls
+
+        # Errors reach every caller, and the next call for the key runs afresh
+        async def failing():
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(single_flight.do("key", failing), single_flight.do("key", failing),
+                                       return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await single_flight.do("key", upstream) == ("response", False)
+        assert (single_flight.leaders, single_flight.coalesced) == (3, 3)
+
+    asyncio.run(scenario())
+    print("Follower got the leader's response after the leader was cancelled")
+
+if __name__ == "__main__":
+    print("Load Balancer Test")
+    print("=" * 50)
+
+    test_routing_during_membership_churn()
+    test_shared_ring_sync_speed()
+    test_ring_store_round_trip()
+    test_warm_start_reconciliation()
+    test_response_cache_ttl()
+    test_response_cache_expiry_and_eviction()
+    test_response_cache_invalidate_node()
+    test_health_checker_thresholds()
+    test_routing_key_extractor()
+    test_async_single_flight_cancelled_leader()
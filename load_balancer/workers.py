@@ -0,0 +1,120 @@
+"""Multi-process load balancer: python workers.py
+
+A single load_balancer.py process is capped at one core by the GIL. This
+starts LB_WORKERS processes (default: one per CPU), each running the Flask
+app on its own SO_REUSEPORT socket bound to PORT, so the kernel spreads
+connections across them. Membership lives in a shared memory segment (see
+shared_ring.py): an /add, /rm or /weight handled by any worker, or an
+ejection by worker 0's health checker, reaches every other worker on its
+next request. Scale jobs and health results are shared the same way, so
+/jobs/<id> and /rep answer alike whichever worker gets them.
+
+Everything else a worker learns from traffic stays in that worker: its
+in-flight counts and latency EWMAs, so bounded-load, p2c,
+least_outstanding and peak_ewma routing balance on its own share of the
+requests only, and its response cache and single-flight calls, so a
+response cached or fetched by one worker is not reused by the others.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from shared_ring import SharedRing, SharedStatus
+from structured_log import log
+
+LB_WORKERS = int(os.getenv("LB_WORKERS", str(os.cpu_count() or 1)))
+PORT = int(os.getenv("PORT", "5000"))
+LOCAL_BASE_PORT = int(os.getenv("LOCAL_BASE_PORT", "18000"))
+WORKER_PORT_RANGE = 1000  # local driver ports per worker
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "30"))
+
+
+def listen(port):
+    """Listening socket that other processes can bind to the same port."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.listen(1024)
+    return sock
+
+
+def run_worker(index, shared_ring_name, shared_status_name, port):
+    """Body of one worker process."""
+    os.environ["SHARED_RING"] = shared_ring_name
+    os.environ["SHARED_STATUS"] = shared_status_name
+    os.environ["LB_WORKER_INDEX"] = str(index)
+    os.environ["LOCAL_BASE_PORT"] = str(LOCAL_BASE_PORT + index * WORKER_PORT_RANGE)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    import load_balancer  # Reads the environment above when the LoadBalancer is built
+
+    sock = listen(port)
+    server = make_server('0.0.0.0', port, load_balancer.app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        stop_all = getattr(load_balancer.lb.driver, "stop_all", None)
+        if stop_all is not None:
+            stop_all()  # Local servers are child processes of the worker that started them
+
+
+def wait_until_ready(port, process):
+    """Poll /rep until the worker answers, so it has registered the initial servers."""
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline and process.is_alive():
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/rep', timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def main(num_workers=LB_WORKERS, port=PORT):
+    shared_ring = SharedRing.create()
+    shared_status = SharedStatus.create()
+    context = multiprocessing.get_context("spawn")  # Fresh interpreters: no threads or locks inherited mid-use
+    processes = []
+
+    def start(index):
+        process = context.Process(target=run_worker, args=(index, shared_ring.name, shared_status.name, port),
+                                  name=f"lb-worker-{index}")
+        process.start()
+        processes.append(process)
+        return process
+
+    def shutdown(signum=None, frame=None):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        shared_ring.close()
+        shared_status.close()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Worker 0 registers the initial servers; the rest find them on the shared ring
+    if not wait_until_ready(port, start(0)):
+        log.error("Worker 0 did not become ready", timeout=READY_TIMEOUT)
+        shutdown()
+    for index in range(1, num_workers):
+        start(index)
+
+    while all(process.is_alive() for process in processes):
+        time.sleep(1)
+    log.error("A worker exited; stopping the others")
+    shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,4 +18,4 @@ def heartbeat():
     return "", 200
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.getenv("PORT", "5000")), debug=False)
\ No newline at end of file